@@ -0,0 +1,233 @@
+import os
+import re
+import csv
+import sys
+import glob
+import logging
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import requests
+from tqdm import tqdm
+
+KEY_SENTENCE_FILE = 'key_sentence_pubs.csv'
+KEY_SENTENCE_FIELDS = ['title', 'author', 'num_citations', 'pub_year', 'url']
+
+DOWNLOAD_WORKERS = 8
+EXTRACT_WORKERS = os.cpu_count() or 2
+MAX_DOWNLOAD_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Wordings of the NYU HPC acknowledgment seen in papers, matched after normalization
+ACKNOWLEDGMENT_VARIANTS = [
+    "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise",
+    "supported in part through the NYU IT High Performance Computing resources",
+    "NYU IT High Performance Computing resources, services, and staff expertise",
+    "NYU IT High-Performance Computing",
+    "NYU High Performance Computing",
+    "High Performance Computing resources at New York University",
+    "New York University High Performance Computing",
+]
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_LINE_BREAK_HYPHEN_RE = re.compile(r'(\w)-\s*\n\s*(\w)')
+
+def normalize_text(text):
+    # Lowercases and collapses punctuation, whitespace and line-break hyphenation
+    text = _LINE_BREAK_HYPHEN_RE.sub(r'\1\2', text)
+    return ' ' + _NON_WORD_RE.sub(' ', text.lower()).strip() + ' '
+
+class AhoCorasick:
+    # Multi-pattern matcher that scans a text once for every pattern
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern, index)
+        self._build_failure_links()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def search(self, text):
+        # Yields (end_position, pattern_index) for every match in the text
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                yield position, index
+
+    def first_match(self, text):
+        for _, index in self.search(text):
+            return self.patterns[index]
+        return None
+
+_matcher = None
+
+def get_matcher():
+    # Built once per extraction process
+    global _matcher
+    if _matcher is None:
+        _matcher = AhoCorasick(normalize_text(variant) for variant in ACKNOWLEDGMENT_VARIANTS)
+    return _matcher
+
+def extract_text(path, content_type):
+    # Extracts plain text from a downloaded PDF or HTML document
+    is_pdf = 'pdf' in content_type
+    if not is_pdf:
+        with open(path, 'rb') as f:
+            is_pdf = f.read(5) == b'%PDF-'
+    if is_pdf:
+        try:
+            from pdfminer.high_level import extract_text as extract_pdf_text
+        except ImportError:
+            logging.warning("pdfminer.six is not installed, skipping PDF document.")
+            return ''
+        return extract_pdf_text(path)
+
+    from bs4 import BeautifulSoup
+    with open(path, 'rb') as f:
+        soup = BeautifulSoup(f, 'html.parser')
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+    return soup.get_text(' ')
+
+def extract_and_match(path, content_type):
+    # Runs in the process pool so only the matched variant travels back, not the full text
+    try:
+        return get_matcher().first_match(normalize_text(extract_text(path, content_type)))
+    finally:
+        os.remove(path)
+
+def download_document(url, download_dir):
+    # Streams a document to disk. Returns (path, content_type), or None for a document larger than
+    # MAX_DOWNLOAD_BYTES: a truncated PDF has no xref trailer, so a partial download cannot be parsed.
+    headers = {'User-Agent': 'Mozilla/5.0 (compatible; publication_crawler)'}
+    with requests.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '').lower()
+        fd, path = tempfile.mkstemp(dir=download_dir)
+        size = 0
+        too_large = False
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_DOWNLOAD_BYTES:
+                    too_large = True
+                    break
+                f.write(chunk)
+    if too_large:
+        os.remove(path)
+        logging.warning(f"Document at {url} exceeds {MAX_DOWNLOAD_BYTES} bytes, skipping it.")
+        return None
+    return path, content_type
+
+def verify_candidates(candidates, download_workers=DOWNLOAD_WORKERS, extract_workers=EXTRACT_WORKERS):
+    # Downloads each candidate's document. Returns (confirmed, failed): the candidates containing
+    # the acknowledgment, and (link, error) for each one that could not be downloaded or read.
+    # A failure is recorded for its candidate and the run goes on with the others.
+    confirmed = []
+    failed = []
+    with tempfile.TemporaryDirectory(prefix='ack_verifier_') as download_dir, \
+            ThreadPoolExecutor(max_workers=download_workers) as downloader, \
+            ProcessPoolExecutor(max_workers=extract_workers) as extractor:
+        download_futures = {downloader.submit(download_document, c['Link'], download_dir): c for c in candidates}
+        extract_futures = {}
+        for future in tqdm(as_completed(download_futures), total=len(download_futures), desc="Downloading documents", leave=True):
+            candidate = download_futures[future]
+            try:
+                download = future.result()
+                if download is None:
+                    continue
+                path, content_type = download
+                extract_futures[extractor.submit(extract_and_match, path, content_type)] = candidate
+            except Exception as e:
+                logging.error(f"Download failed for {candidate['Link']}: {e}")
+                failed.append((candidate['Link'], f"download: {e}"))
+
+        for future in tqdm(as_completed(extract_futures), total=len(extract_futures), desc="Matching acknowledgments", leave=True):
+            candidate = extract_futures[future]
+            try:
+                variant = future.result()
+            except Exception as e:
+                logging.error(f"Text extraction failed for {candidate['Link']}: {e}")
+                failed.append((candidate['Link'], f"extraction: {e}"))
+                continue
+            if variant:
+                logging.info(f"Confirmed acknowledgment in {candidate['Link']}")
+                confirmed.append(candidate)
+    if failed:
+        logging.warning(f"{len(failed)} of {len(candidates)} documents could not be verified")
+    return confirmed, failed
+
+def load_candidates(csv_filenames, exclude_links=()):
+    # Reads search hits from results CSV files, one per unique link
+    seen = set(exclude_links)
+    candidates = []
+    for csv_filename in csv_filenames:
+        with open(csv_filename, mode='r', newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                link = row.get('Link', '')
+                if link.startswith('http') and link not in seen:
+                    seen.add(link)
+                    candidates.append(row)
+    return candidates
+
+def load_confirmed_links(filename=KEY_SENTENCE_FILE):
+    if not os.path.exists(filename):
+        return set()
+    with open(filename, mode='r', newline='', encoding='utf-8') as file:
+        return {row['url'] for row in csv.DictReader(file)}
+
+def write_confirmed(confirmed, filename=KEY_SENTENCE_FILE):
+    # Appends confirmed publications to key_sentence_pubs.csv
+    file_exists = os.path.isfile(filename) and os.path.getsize(filename) > 0
+    with open(filename, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=KEY_SENTENCE_FIELDS)
+        if not file_exists:
+            writer.writeheader()
+        for candidate in confirmed:
+            writer.writerow({'title': candidate.get('Title', ''), 'author': '', 'num_citations': '', 'pub_year': '', 'url': candidate['Link']})
+    logging.info(f"{len(confirmed)} confirmed publications written to {filename}")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    csv_filenames = sys.argv[1:] or sorted(glob.glob('results/*.csv'))
+    candidates = load_candidates(csv_filenames, exclude_links=load_confirmed_links())
+
+    # Settle what the search snippets can decide before downloading anything
+    from snippet_filter import triage_hits
+    accepted, to_verify, rejected = triage_hits(candidates)
+    print(f"{len(accepted)} hits accepted and {len(rejected)} rejected from their snippets, verifying {len(to_verify)} by full text")
+    confirmed, failed = verify_candidates(to_verify)
+    write_confirmed(accepted + confirmed)
+    if failed:
+        print(f"{len(failed)} documents could not be verified, see the log for the errors")
+
+if __name__ == "__main__":
+    main()
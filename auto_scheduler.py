@@ -6,7 +6,9 @@ import tkinter as tk
 from tkinter import messagebox
 
 repo_path = r"C:\Users\mohan\OneDrive\Desktop\GitHub_Repo\publication_crawler"
-script_path = os.path.join(repo_path, 'test_script.py')
+script_path = os.path.join(repo_path, 'google_scholar_new.py')
+# Scheduled runs only page through what is new since the previous run
+crawler_args = ['--scheduled', '--incremental']
 log_dir = os.path.join(os.path.expanduser('~'), 'Desktop', 'log')
 log_file = os.path.join(log_dir, 'last_run.log')
 
@@ -45,7 +47,7 @@ def should_run():
 def run_script():
     log_message("Attempting to run the test script.")
     try:
-        subprocess.run(['python', script_path], check=True)
+        subprocess.run(['python', script_path] + crawler_args, check=True, cwd=repo_path)
         log_message("Script executed successfully.")
     except subprocess.CalledProcessError as e:
         log_message(f"Error executing script: {e}")
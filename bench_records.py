@@ -0,0 +1,60 @@
+import random
+import argparse
+import tracemalloc
+from publication_records import PublicationRecord, RecordBatch
+
+# Share of results that repeat an earlier one, as overlapping pages and year windows do
+DUPLICATE_SHARE = 0.3
+
+def synthetic_results(count, seed=1105):
+    # Result dicts shaped like the parsers' output, with fresh string objects for every
+    # result so repeated publications are not shared the way string literals would be
+    rng = random.Random(seed)
+    for i in range(count):
+        n = rng.randrange(i) if i and rng.random() < DUPLICATE_SHARE else i
+        yield {
+            'Title': ''.join(['Scalable simulation of turbulent flows on HPC clusters, part ', str(n)]),
+            'Link': ''.join(['https://example.org/articles/', str(n), '/fulltext.pdf']),
+            'MLA Citation': "MLA citation not found" if n % 4 else ''.join(['Doe, J. "Scalable simulation ', str(n), '." 2024.']),
+            'Snippet': ''.join(['This work was supported in part through the NYU IT High Performance Computing resources ', str(i)]),
+        }
+
+def measure(build, count):
+    # Bytes still held once build() has consumed count freshly parsed results, strings included
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build(synthetic_results(count))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+def build_dicts(results):
+    return list(results)
+
+def build_records(results):
+    return [PublicationRecord.from_dict(result) for result in results]
+
+def build_batch(results):
+    return RecordBatch(results)
+
+CONTAINERS = [
+    ('list of dicts', build_dicts),
+    ('list of PublicationRecord', build_records),
+    ('RecordBatch', build_batch),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the memory held by result dicts, slotted records and columnar batches")
+    parser.add_argument('--records', type=int, default=100000, help="Number of synthetic results")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    baseline = measure(build_dicts, args.records)
+    for name, build in CONTAINERS:
+        held = measure(build, args.records)
+        print(f"{name:<28} {held / args.records:8.1f} bytes/record  {held / baseline:6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Entry points measured by default, imported by module name from the repository root
+DEFAULT_MODULES = [
+    'google_crawler',
+    'google_scholar_new',
+    'google_scholar_crawler',
+    'generalized_work',
+    'google_scholar_test',
+    'ack_verifier',
+    'snippet_filter',
+    'near_dedup',
+]
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def time_command(code, cwd, runs):
+    # Returns the best wall time of running `python -c code` in a fresh interpreter
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, PYTHONDONTWRITEBYTECODE='1')
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_module(module, runs):
+    # Imports a module in an empty working directory and reports its import time
+    # over a bare interpreter, plus any files the import left behind
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as cwd:
+        baseline = time_command('pass', cwd, runs)
+        elapsed = time_command(f'import {module}', cwd, runs)
+        created = sorted(os.listdir(cwd))
+    return elapsed - baseline, created
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the import time and import side effects of the crawler entry points")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument('--runs', type=int, default=5, help="Imports per module, the fastest one is reported")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    failed = False
+    for module in args.modules:
+        try:
+            import_time, created = bench_module(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<28} import failed: {e}")
+            failed = True
+            continue
+        note = f"  created: {', '.join(created)}" if created else ''
+        print(f"{module:<28} {import_time * 1000:8.1f} ms{note}")
+        failed = failed or bool(created)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
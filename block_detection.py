@@ -0,0 +1,57 @@
+import re
+
+# Verdicts for a fetched result page
+RESULTS = 'results'
+EMPTY = 'empty'
+BLOCKED = 'blocked'
+UNKNOWN = 'unknown'
+
+# Scholar and Google result pages are a few hundred KB; the markers below sit well within this
+SCAN_BYTES = 512 * 1024
+
+# Scanned over the raw bytes before any parsing. A result marker anywhere in the scan wins, so a
+# results page quoting "captcha" in a snippet still counts as results; otherwise the first block
+# or empty marker found decides.
+RESULT_MARKERS_RE = re.compile(rb'class="gs_ri"|class="gs_r gs_or gs_scl"|class="tF2Cxc"|class="g tF2Cxc"', re.IGNORECASE)
+PAGE_MARKERS_RE = re.compile(
+    rb'(?P<blocked>unusual traffic from your computer network|id="gs_captcha_f"|id="captcha-form"'
+    rb'|class="g-recaptcha"|/sorry/index|not a robot)'
+    rb'|(?P<empty>did not match any articles|did not match any documents)',
+    re.IGNORECASE,
+)
+
+class BlockedPageError(Exception):
+    # Raised for a block page or CAPTCHA interstitial served in place of results
+    def __init__(self, page, proxy, reason, retry_after=0):
+        super().__init__(f"Page {page} blocked through {proxy or 'direct'}: {reason}")
+        self.page = page
+        self.proxy = proxy
+        self.reason = reason
+        self.retry_after = retry_after
+
+def classify_body(body):
+    # Returns (verdict, marker) from a byte scan of the start of a page body
+    if isinstance(body, str):
+        body = body.encode('utf-8', errors='replace')
+    match = RESULT_MARKERS_RE.search(body, 0, SCAN_BYTES)
+    if match is not None:
+        return RESULTS, match.group().decode('ascii', errors='replace')
+    match = PAGE_MARKERS_RE.search(body, 0, SCAN_BYTES)
+    if match is None:
+        # Neither results nor a known interstitial, left for the parser to decide
+        return UNKNOWN, None
+    return match.lastgroup, match.group().decode('ascii', errors='replace')
+
+def classify_response(response):
+    # Tells results, empty result pages and block pages apart from the status, final URL,
+    # headers and a byte scan, without parsing the HTML.
+    # Returns (verdict, reason).
+    if response.status_code == 429:
+        return BLOCKED, 'status 429'
+    urls = [r.url for r in getattr(response, 'history', [])] + [response.url or '']
+    if any('/sorry/' in url for url in urls):
+        return BLOCKED, 'sorry redirect'
+    content_type = response.headers.get('Content-Type', '')
+    if content_type and 'html' not in content_type:
+        return EMPTY, f"content type {content_type}"
+    return classify_body(response.content)
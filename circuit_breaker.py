@@ -0,0 +1,164 @@
+import time
+import logging
+import threading
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# A free proxy that fails twice in a row is rarely back within minutes
+PROXY_FAILURE_THRESHOLD = 2
+PROXY_RESET_TIMEOUT = 300
+# The target host gets more slack, failures there are spread over every proxy
+HOST_FAILURE_THRESHOLD = 5
+HOST_RESET_TIMEOUT = 120
+HALF_OPEN_MAX_CALLS = 1
+# Wait suggested while every half-open trial slot is taken, about one request timeout
+TRIAL_WAIT = 10
+
+class CircuitOpenError(Exception):
+    # Raised instead of making a request while the breaker for its key is open
+    def __init__(self, key, retry_after):
+        super().__init__(f"Circuit open for {key}, retry in {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+class Permit:
+    # One request claimed on a breaker, released once the request is over whatever its outcome.
+    # Releasing hands a half-open trial slot back, unless a recorded outcome has closed or
+    # reopened the circuit since. Safe to release twice, and usable as a context manager.
+
+    __slots__ = ('breaker', 'generation')
+
+    def __init__(self, breaker, generation=None):
+        self.breaker = breaker
+        self.generation = generation
+
+    def release(self):
+        breaker, self.breaker = self.breaker, None
+        if breaker is not None and self.generation is not None:
+            breaker._release_trial(self.generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class CircuitBreaker:
+    # Closed: requests flow and consecutive failures are counted.
+    # Open: requests fail fast until reset_timeout has passed.
+    # Half-open: a limited number of trial requests decide whether to close or reopen.
+
+    def __init__(self, key, failure_threshold, reset_timeout, half_open_max_calls=HALF_OPEN_MAX_CALLS, on_open=None):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_open = on_open
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_calls = 0
+        self._generation = 0  # Times the circuit opened, so a stale permit cannot free a newer trial slot
+        self._lock = threading.Lock()
+
+    def _refresh(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._trial_calls = 0
+
+    def _available(self):
+        return self.state == CLOSED or (self.state == HALF_OPEN and self._trial_calls < self.half_open_max_calls)
+
+    def retry_after(self):
+        # Seconds until a request may go through, 0 when one may go through now
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._available():
+                return 0
+            if self.state == HALF_OPEN:
+                return TRIAL_WAIT
+            return max(0, self.reset_timeout - (now - self.opened_at))
+
+    def is_available(self):
+        # Whether a request could go through now, without taking a half-open trial slot
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._available()
+
+    def acquire(self):
+        # Claims one request, taking a trial slot when half-open. Returns a Permit to release
+        # once the request is over, None when the circuit does not let a request through.
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self.state == CLOSED:
+                return Permit(self)
+            if self.state == HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+                self._trial_calls += 1
+                return Permit(self, self._generation)
+            return None
+
+    def check(self):
+        # acquire() for callers that fail fast, raising instead of returning None
+        permit = self.acquire()
+        if permit is None:
+            raise CircuitOpenError(self.key, self.retry_after())
+        return permit
+
+    def _release_trial(self, generation):
+        with self._lock:
+            if self.state == HALF_OPEN and generation == self._generation and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(f"Circuit for {self.key} closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._open()
+
+    def trip(self):
+        # Opens the circuit at once, for a failure that one occurrence is enough to judge
+        with self._lock:
+            self.failures += 1
+            if self.state != OPEN:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._generation += 1
+        logging.warning(f"Circuit for {self.key} opened after {self.failures} failures")
+        if self.on_open:
+            self.on_open(self.key)
+
+class BreakerRegistry:
+    # One breaker per key, created on first use with the registry's settings
+
+    def __init__(self, failure_threshold, reset_timeout, half_open_max_calls=HALF_OPEN_MAX_CALLS, on_open=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_open = on_open
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(key, self.failure_threshold, self.reset_timeout,
+                                                               self.half_open_max_calls, self.on_open)
+            return breaker
+
+    def available(self, keys):
+        # Filters keys down to the ones whose breaker would let a request through
+        return [key for key in keys if self.get(key).is_available()]
@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from a fast direct request to a proxy that times out
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PARSE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+DEFAULT_METRICS_PORT = 9108
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"' for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    # Base for labelled metrics: one value slot per combination of label values
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+    def _key(self, key):
+        if key is None:
+            if self.labelnames:
+                raise ValueError(f"Metric {self.name} needs labels {self.labelnames}")
+            return ()
+        return key
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, _key=None):
+        key = self._key(_key)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, _key=None):
+        key = self._key(_key)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, _key=None):
+        key = self._key(_key)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, _key=None):
+        self.inc(-amount, _key)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, _key=None):
+        key = self._key(_key)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, _key=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, _key)
+
+    def _render_sample(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class _Child:
+    # A metric bound to one set of label values, as returned by Metric.labels()
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def __getattr__(self, name):
+        method = getattr(self._metric, name)
+        return lambda *args, **kwargs: method(*args, _key=self._key, **kwargs)
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        # Prometheus text exposition format
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Metrics shared by the crawlers
+REQUEST_LATENCY = REGISTRY.histogram('crawler_request_seconds', 'Latency of search page requests', ['host', 'proxy'])
+REQUESTS = REGISTRY.counter('crawler_requests_total', 'Search page requests by outcome', ['host', 'status'])
+RETRIES = REGISTRY.counter('crawler_retries_total', 'Search page requests retried after a failure', ['host', 'error'])
+RETRY_BUDGET_EXHAUSTED = REGISTRY.counter('crawler_retry_budget_exhausted_total', 'Retries skipped because the crawl-wide retry budget was spent', ['error'])
+PROXY_POOL_SIZE = REGISTRY.gauge('crawler_proxy_pool_size', 'Proxies currently in the valid pool')
+PROXIES_CHECKED = REGISTRY.counter('crawler_proxies_checked_total', 'Scraped proxies validated', ['result'])
+PROXIES_REMOVED = REGISTRY.counter('crawler_proxies_removed_total', 'Proxies dropped from the pool after failing a request')
+PARSE_SECONDS = REGISTRY.histogram('crawler_parse_seconds', 'Time spent parsing a result page', buckets=PARSE_BUCKETS)
+PAGES_PENDING = REGISTRY.gauge('crawler_pages_pending', 'Result pages submitted to the worker pool and not yet finished')
+RECORDS_WRITTEN = REGISTRY.counter('crawler_records_written_total', 'Result rows written to CSV')
+BREAKER_TRIPS = REGISTRY.counter('crawler_breaker_trips_total', 'Circuit breakers opened', ['kind'])
+PAGES_RESCHEDULED = REGISTRY.counter('crawler_pages_rescheduled_total', 'Pages deferred because a circuit was open')
+PAGE_VERDICTS = REGISTRY.counter('crawler_page_verdicts_total', 'Fetched pages by response classification', ['verdict'])
+PAGINATION_REQUESTS_SAVED = REGISTRY.counter('crawler_pagination_requests_saved_total', 'Page requests skipped after a page repeated an earlier one')
+HEDGES = REGISTRY.counter('crawler_hedges_total', 'Hedged requests by outcome', ['outcome'])
+
+def host_of(url):
+    return urlsplit(url).netloc or url
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a line in the crawl log
+        pass
+
+def start_metrics_server(port=DEFAULT_METRICS_PORT, host='127.0.0.1', registry=REGISTRY):
+    # Serves /metrics from a daemon thread for the lifetime of the crawl
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logging.info(f"Serving crawl metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+def dump_metrics(filename, registry=REGISTRY):
+    # Writes the final values of every metric at the end of a run
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    logging.info(f"Crawl metrics written to {filename}")
+    return filename
@@ -0,0 +1,157 @@
+import asyncio
+import inspect
+from incremental import publication_key
+from publication_records import RecordBatch
+
+# Items buffered between two stages. A stage that falls behind fills its input queue and the
+# stages before it wait on put(), so a slow sink holds the fetcher back instead of the crawl
+# piling up in memory.
+DEFAULT_QUEUE_SIZE = 4
+DEFAULT_FETCH_CONCURRENCY = 4
+DEFAULT_SINK_BATCH = 100
+
+_DONE = object()
+
+async def call(fn, *args):
+    # Awaits a coroutine function, runs a plain function in a worker thread so it does not block the loop
+    if inspect.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+async def iterate(items):
+    # Async iteration over a plain or async iterable
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+async def _pump(items, queue):
+    async for item in items:
+        await queue.put(item)
+    await queue.put(_DONE)
+
+async def _drain(queue):
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            return
+        yield item
+
+async def _count(items):
+    count = 0
+    async for _ in items:
+        count += 1
+    return count
+
+async def run_pipeline(source, *stages, queue_size=DEFAULT_QUEUE_SIZE):
+    # Streams source through the stages. A stage is any callable taking an async iterator and
+    # returning one, typically an async generator function; each runs in its own task behind a
+    # bounded queue. The first error in any stage cancels the others and is raised here.
+    # Returns the number of items that came out of the last stage.
+    items = iterate(source)
+    tasks = []
+    for stage in stages:
+        queue = asyncio.Queue(queue_size)
+        tasks.append(asyncio.create_task(_pump(items, queue)))
+        items = stage(_drain(queue))
+    tasks.append(asyncio.create_task(_count(items)))
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return tasks[-1].result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def fetch_stage(fetch_page, concurrency=DEFAULT_FETCH_CONCURRENCY):
+    # Pages in, (page, html) out, with up to concurrency fetches in flight. Completion order,
+    # pages whose fetch returned nothing are dropped. fetch_page(page) may be sync or async.
+    async def fetch_one(page):
+        return page, await call(fetch_page, page)
+
+    def fetched(done):
+        for task in done:
+            page, html = task.result()
+            if html:
+                yield page, html
+
+    async def stage(pages):
+        pending = set()
+        try:
+            async for page in pages:
+                pending.add(asyncio.ensure_future(fetch_one(page)))
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for item in fetched(done):
+                        yield item
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for item in fetched(done):
+                    yield item
+        finally:
+            # On an error or cancellation the fetches still in flight are cancelled and awaited,
+            # so none outlives the pipeline
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    return stage
+
+def parse_stage(parse):
+    # (page, html) in, one RecordBatch per page out. parse(html) runs in a worker thread.
+    async def stage(pages):
+        async for _, html in pages:
+            results = await call(parse, html)
+            yield results if isinstance(results, RecordBatch) else RecordBatch(results)
+    return stage
+
+def dedup_stage(index=None, key=publication_key):
+    # Drops records already seen in this pipeline by key, and near-duplicates of the
+    # records in index (a near_dedup.NearDuplicateIndex) when one is given. Records
+    # without a key, neither a link nor a title, are all kept.
+    async def stage(batches):
+        seen = set()
+        async for batch in batches:
+            kept = RecordBatch()
+            for record in batch:
+                record_key = key(record)
+                if record_key is not None:
+                    if record_key in seen:
+                        continue
+                    seen.add(record_key)
+                if index is not None and index.add(record)[1]:
+                    continue
+                kept.append(record)
+            if kept:
+                yield kept
+    return stage
+
+def map_stage(fn):
+    # Applies fn to every item, for enrichment steps between the built-in stages.
+    # Items for which fn returns None are dropped.
+    async def stage(items):
+        async for item in items:
+            result = await call(fn, item)
+            if result is not None:
+                yield result
+    return stage
+
+def sink_stage(write, batch_size=DEFAULT_SINK_BATCH):
+    # Collects records into batches of about batch_size and passes each to write(batch),
+    # yielding every batch once it is written
+    async def stage(batches):
+        pending = RecordBatch()
+        async for batch in batches:
+            pending.extend(batch)
+            if len(pending) >= batch_size:
+                await call(write, pending)
+                yield pending
+                pending = RecordBatch()
+        if pending:
+            await call(write, pending)
+            yield pending
+    return stage
@@ -0,0 +1,68 @@
+import math
+import logging
+from query_planner import RESULTS_PER_PAGE, parse_result_count
+
+MAX_RESULTS = 1000  # Scholar and Google stop serving results after about 1000 hits
+PAGES_PER_WORKER = 10
+MAX_WORKERS = 5
+SECONDS_PER_PAGE = 15  # Typical page time through free proxies, including retries and pauses
+
+def preflight_query(query, fetch_first_page):
+    # Fetches the first result page of a query and reads its "About N results" estimate.
+    # fetch_first_page(query) returns the HTML of the page, which is kept so it is not fetched twice.
+    html_content = fetch_first_page(query)
+    if not html_content:
+        logging.warning(f"Preflight request failed for query: {query}")
+        return {'query': query, 'count': None, 'html': None}
+    count = parse_result_count(html_content)
+    logging.info(f"Preflight estimate for query '{query}': {count} results")
+    return {'query': query, 'count': count, 'html': html_content}
+
+def size_crawl(count, results_per_page=RESULTS_PER_PAGE, max_results=MAX_RESULTS):
+    # Returns (total_pages, workers) for a query with an estimated result count
+    if not count:
+        return 0, 0
+    total_pages = math.ceil(min(count, max_results) / results_per_page)
+    workers = max(1, min(MAX_WORKERS, math.ceil(total_pages / PAGES_PER_WORKER)))
+    return total_pages, workers
+
+def allocate_budget(preflights, valid_proxies, time_budget=None, results_per_page=RESULTS_PER_PAGE):
+    # Shares proxies and crawl time between queries in proportion to their size, skipping empty ones.
+    # Returns one plan per non-empty query with its page budget, workers and proxy slice.
+    sized = []
+    for preflight in preflights:
+        total_pages, workers = size_crawl(preflight['count'], results_per_page)
+        if preflight['count'] is None:
+            # Unknown size, crawl it with the default budget rather than dropping it
+            total_pages, workers = math.ceil(MAX_RESULTS / results_per_page), MAX_WORKERS
+        if total_pages == 0:
+            logging.info(f"Skipping query with no results: {preflight['query']}")
+            continue
+        sized.append((preflight, total_pages, workers))
+
+    plans = []
+    all_pages = sum(total_pages for _, total_pages, _ in sized)
+    proxy_start = 0
+    for preflight, total_pages, workers in sized:
+        share = total_pages / all_pages
+        proxy_count = max(1, round(share * len(valid_proxies))) if valid_proxies else 0
+        proxies = valid_proxies[proxy_start:proxy_start + proxy_count] or list(valid_proxies)
+        proxy_start += proxy_count
+
+        if time_budget is not None:
+            seconds = share * time_budget
+            total_pages = max(1, min(total_pages, int(seconds * workers / SECONDS_PER_PAGE)))
+        else:
+            seconds = None
+
+        plans.append({
+            'query': preflight['query'],
+            'count': preflight['count'],
+            'html': preflight['html'],
+            'total_pages': total_pages,
+            'workers': workers,
+            'proxies': proxies,
+            'seconds': seconds
+        })
+        logging.info(f"Planned {total_pages} pages with {workers} workers and {len(proxies)} proxies for query: {preflight['query']}")
+    return plans
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import inspect
+import logging
+import threading
+import functools
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 10
+TRACEMALLOC_FRAMES = 5
+
+# Pipeline stages and the crawler functions that implement them. Only the names a module
+# defines are wrapped, so the same table serves every crawler.
+STAGE_FUNCTIONS = {
+    'scrape_proxies': 'proxy_scrape',
+    'get_valid_proxies': 'validation',
+    'fetch_page_results': 'fetch',
+    'fetch_page_html': 'fetch',
+    'fetch_page': 'fetch',
+    'fetch_search_results': 'fetch',
+    'parse_results': 'parse',
+    'write_to_csv': 'write',
+    'setup_proxy': 'proxy_scrape',
+    'fetch_author_publications': 'fetch',
+    'fill_publication': 'fetch',
+    'build_pub_row': 'parse',
+    'rewrite_output_file': 'write',
+}
+
+_profiler = None
+
+class SamplingProfiler:
+    # Samples the stack of every thread from a background thread and counts
+    # identical stacks, tagged with the stage the thread was in at the time
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.stage_samples = Counter()
+        self.stage_functions = defaultdict(Counter)
+        self.stage_wall = defaultdict(float)
+        self.stage_calls = Counter()
+        # Change in process-wide traced memory over each stage call, which includes what
+        # other threads allocated meanwhile; the allocation section attributes by traceback
+        self.stage_memory = defaultdict(int)
+        self._thread_stages = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                stages = {thread_id: stack[-1] for thread_id, stack in self._thread_stages.items() if stack}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stage = stages.get(thread_id, 'other')
+                stack.append(f"[{stage}]")
+                stack.reverse()
+                self.samples[';'.join(stack)] += 1
+                self.stage_samples[stage] += 1
+                self.stage_functions[stage][stack[-1]] += 1
+
+    def enter_stage(self, name):
+        with self._lock:
+            self._thread_stages.setdefault(threading.get_ident(), []).append(name)
+
+    def exit_stage(self, name, elapsed, memory_delta):
+        with self._lock:
+            stack = self._thread_stages.get(threading.get_ident(), [])
+            if name in stack:
+                # Coroutines sharing a thread can leave their stages out of order
+                del stack[len(stack) - 1 - stack[::-1].index(name)]
+            self.stage_wall[name] += elapsed
+            self.stage_calls[name] += 1
+            self.stage_memory[name] += memory_delta
+
+@contextmanager
+def profile_stage(name):
+    # Attributes the enclosed work to a pipeline stage, free when no profile is running
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    profiler.enter_stage(name)
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.exit_stage(name, time.perf_counter() - start, tracemalloc.get_traced_memory()[0] - memory_before)
+
+def _wrap_stage(func, stage):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with profile_stage(stage):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_stage(stage):
+            return func(*args, **kwargs)
+    return wrapper
+
+def instrument_stages(module, stage_functions=STAGE_FUNCTIONS):
+    # Wraps a crawler module's stage functions in place. Calls inside the module go
+    # through its globals, so they pick up the wrapped versions too.
+    for function_name, stage in stage_functions.items():
+        func = getattr(module, function_name, None)
+        if callable(func) and not hasattr(func, '__wrapped__'):
+            setattr(module, function_name, _wrap_stage(func, stage))
+
+def write_report(profiler, snapshot_start, snapshot_end, total_time, report_filename, top=TOP_ALLOCATIONS):
+    total_samples = sum(profiler.stage_samples.values()) or 1
+    lines = [f"Profile of a {total_time:.1f}s run, {total_samples} stack samples every {profiler.interval * 1000:.0f} ms", '']
+    lines.append(f"{'stage':<14}{'calls':>8}{'wall s':>10}{'samples':>10}{'share':>8}{'process mem KiB':>16}")
+    stages = sorted(set(profiler.stage_samples) | set(profiler.stage_calls), key=lambda s: -profiler.stage_samples[s])
+    for stage in stages:
+        lines.append(f"{stage:<14}{profiler.stage_calls[stage]:>8}{profiler.stage_wall[stage]:>10.2f}"
+                     f"{profiler.stage_samples[stage]:>10}{profiler.stage_samples[stage] / total_samples:>8.1%}"
+                     f"{profiler.stage_memory[stage] / 1024:>16.1f}")
+    lines.append('')
+    lines.append("Wall time includes nested stages and adds up across threads for stages running on several threads.")
+    lines.append("Process mem is the change in process-wide traced memory while the stage ran, allocations by other")
+    lines.append("threads running at the same time included; see the allocations below for where memory went.")
+
+    for stage in stages:
+        lines.append('')
+        lines.append(f"== {stage}: hottest functions (innermost frame)")
+        for function, count in profiler.stage_functions[stage].most_common(TOP_FUNCTIONS):
+            lines.append(f"{count:>8}  {function}")
+
+    lines.append('')
+    lines.append(f"== Top {top} allocations by size growth over the run")
+    own_files = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    growth = snapshot_end.filter_traces(own_files).compare_to(snapshot_start.filter_traces(own_files), 'traceback')
+    for stat in growth[:top]:
+        frame = stat.traceback[-1]
+        lines.append(f"{stat.size_diff / 1024:>10.1f} KiB {stat.count_diff:>+8}  {frame.filename}:{frame.lineno}")
+        for caller in reversed(stat.traceback[:-1]):
+            lines.append(f"{'':>29}from {caller.filename}:{caller.lineno}")
+
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append('')
+    lines.append(f"Traced memory at exit {current / 1024 / 1024:.1f} MiB, peak {peak / 1024 / 1024:.1f} MiB")
+    with open(report_filename, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+@contextmanager
+def profile_run(enabled, module=None, output_dir='logs', name='crawl'):
+    # Profiles the enclosed run when enabled. Writes collapsed stacks for flamegraph.pl
+    # or speedscope and a text report with a section per stage and the top allocations.
+    global _profiler
+    if not enabled:
+        yield
+        return
+    if module is not None:
+        instrument_stages(module)
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"{name}_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    snapshot_start = tracemalloc.take_snapshot()
+    _profiler = profiler = SamplingProfiler()
+    profiler.start()
+    start = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        total_time = time.perf_counter() - start
+        profiler.stop()
+        _profiler = None
+        snapshot_end = tracemalloc.take_snapshot()
+
+        with open(f"{prefix}.collapsed", 'w', encoding='utf-8') as f:
+            for stack, count in profiler.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        write_report(profiler, snapshot_start, snapshot_end, total_time, f"{prefix}.txt")
+        tracemalloc.stop()
+        logging.info(f"Profile written to {prefix}.collapsed and {prefix}.txt")
+        print(f"Profile written to {prefix}.collapsed and {prefix}.txt")
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# Spans are written as Chrome trace "complete" events, one per line, after an opening "[".
+# The trace format allows the closing bracket to be missing, so a file from a crawl that is
+# still running or was killed loads as is in chrome://tracing, Perfetto or speedscope.
+DEFAULT_TRACE_DIR = 'logs'
+
+_tracer = None
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Tracer:
+    def __init__(self, filename):
+        self.filename = filename
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._file = open(filename, 'w', encoding='utf-8')
+        self._file.write('[\n')
+
+    def export(self, span, end):
+        event = {
+            'name': span['name'],
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': round((span['start'] - self._origin) * 1e6),
+            'dur': round((end - span['start']) * 1e6),
+            'pid': self.pid,
+            'tid': span['tid'],
+            'args': span['attrs'],
+        }
+        line = json.dumps(event, default=str)
+        with self._lock:
+            # Worker threads can still finish spans after stop_tracing(), those are dropped
+            if self._file.closed:
+                return
+            self._file.write(line + ',\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def start_tracing(filename=None, trace_dir=DEFAULT_TRACE_DIR):
+    # Starts exporting spans to a trace file for the rest of the run
+    global _tracer
+    if filename is None:
+        os.makedirs(trace_dir, exist_ok=True)
+        filename = os.path.join(trace_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_trace.json")
+    _tracer = Tracer(filename)
+    logging.info(f"Tracing page fetches to {filename}")
+    return filename
+
+def stop_tracing():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+def span(name, **attrs):
+    # Records a child span of the current span, or a new trace when there is none.
+    # Yields the span's attribute dict so callers can add outcomes such as the status code.
+    return _open_span(name, _current_span.get(), attrs)
+
+def trace_page(page, **attrs):
+    # Root span of one page job, every span opened inside it shares its trace id
+    return _open_span('page', None, dict(page=page, **attrs))
+
+@contextmanager
+def _open_span(name, parent, attrs):
+    tracer = _tracer
+    if tracer is None:
+        yield {}
+        return
+    trace_id = parent['attrs']['trace_id'] if parent else uuid.uuid4().hex[:16]
+    current = {
+        'name': name,
+        'cat': parent['cat'] if parent else name,
+        'start': time.perf_counter(),
+        'tid': threading.get_ident(),
+        'attrs': {'trace_id': trace_id, 'span_id': uuid.uuid4().hex[:8],
+                  'parent_id': parent['attrs']['span_id'] if parent else None, **attrs},
+    }
+    token = _current_span.set(current)
+    try:
+        yield current['attrs']
+    except BaseException as e:
+        current['attrs']['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.export(current, time.perf_counter())
+
+@contextmanager
+def tracing_run(enabled, filename=None):
+    if not enabled:
+        yield None
+        return
+    filename = start_tracing(filename)
+    try:
+        yield filename
+    finally:
+        stop_tracing()
+        print(f"Trace written to {filename}")
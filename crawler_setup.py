@@ -0,0 +1,154 @@
+import os
+import copy
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+
+# Snapshot of current desktop browser user agents shipped with the crawler,
+# so no user-agent dataset is downloaded or parsed at startup
+USER_AGENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'user_agents.json')
+
+# Log level can be raised to DEBUG for a run, which enables the full result payload dumps
+LOG_LEVEL_ENV = 'CRAWLER_LOG_LEVEL'
+
+# Each event type (an explicit extra={'event': ...} or else the logging call site) may
+# log SAMPLE_BURST events at once and SAMPLE_RATE events per second after that.
+# Dropped events are counted and reported on the next event of the same type.
+SAMPLE_RATE = 1.0
+SAMPLE_BURST = 20
+
+# Attributes every LogRecord has, anything else was passed through extra= and is written as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'event', 'suppressed'}
+
+_user_agents = None
+_log_listener = None
+_log_handler = None
+_log_filename = None
+
+def load_user_agents(path=USER_AGENTS_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_random_user_agent():
+    # Loads the snapshot on first use and picks a random user agent from it
+    global _user_agents
+    if _user_agents is None:
+        _user_agents = load_user_agents()
+    return random.choice(_user_agents)
+
+def event_type(record):
+    return getattr(record, 'event', None) or f"{record.module}:{record.lineno}"
+
+class JsonFormatter(logging.Formatter):
+    # Writes one JSON object per line with the event type and any extra= fields
+
+    def format(self, record):
+        event = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': event_type(record),
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                event[key] = value
+        if getattr(record, 'suppressed', 0):
+            event['suppressed'] = record.suppressed
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str)
+
+class EventSampler(logging.Filter):
+    # Token bucket per event type, so a burst of identical proxy errors cannot flood the log.
+    # Errors are never sampled: each one may be the only trace of a failed page.
+
+    def __init__(self, rate=SAMPLE_RATE, burst=SAMPLE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        key = event_type(record)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        record.suppressed = suppressed
+        return True
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler runs the full formatter in the calling thread before queueing.
+    # Here only the message is merged with its args, since the args may be mutable objects
+    # that change before the listener gets to them. The listener thread builds the JSON
+    # event, including any traceback, and does the file write.
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def resolve_level(level):
+    # Returns the numeric level for a level number or name, None for an unknown name
+    if isinstance(level, int):
+        return level
+    level = logging.getLevelName(str(level).strip().upper())
+    return level if isinstance(level, int) else None
+
+def setup_logging(log_dir=None, level=None):
+    # Sets up JSON logging to a date-based file, written by a background thread.
+    # Called from main() rather than at import time, so importing a crawler creates no files or directories.
+    # Calling it again while logging is set up changes nothing and returns the same file name.
+    global _log_listener, _log_handler, _log_filename
+    if _log_listener is not None:
+        return _log_filename
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    log_filename = os.path.join(log_dir or '', f"{datetime.now().strftime('%Y-%m-%d')}.log")
+    requested = level if level is not None else os.environ.get(LOG_LEVEL_ENV, 'INFO')
+    level = resolve_level(requested)
+
+    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(EventSampler())
+
+    root = logging.getLogger()
+    root.setLevel(level if level is not None else logging.INFO)
+    root.addHandler(queue_handler)
+
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _log_listener.start()
+    _log_handler = queue_handler
+    _log_filename = log_filename
+    atexit.register(stop_logging)
+    if level is None:
+        logging.warning(f"Unknown log level {requested!r} in {LOG_LEVEL_ENV}, logging at INFO")
+    return log_filename
+
+def stop_logging():
+    # Flushes the queued events and closes the log file, registered to run at interpreter exit
+    global _log_listener, _log_handler
+    if _log_listener is not None:
+        logging.getLogger().removeHandler(_log_handler)
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+        _log_handler = None
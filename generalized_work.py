@@ -1,35 +1,22 @@
 import os
+import sys
+import argparse
 import csv
-import time
 import random
 import logging
 import json
-from fake_useragent import UserAgent
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from crawler_setup import setup_logging, get_random_user_agent
+from crawl_profiler import profile_run
+from page_fingerprint import PaginationGuard
+from crawl_tracing import span, trace_page, tracing_run
+from retry_policy import RETRY_POLICY, CONNECT, classify_error
 import requests
 from bs4 import BeautifulSoup
 from time import sleep
 
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
-
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Generate a random user agent
-user_agent_cache = UserAgent()
-def get_random_user_agent():
-    return user_agent_cache.random
-
 def scrape_proxies():
     # Scrapes proxies from multiple free proxy listing websites
     proxy_sites = [
@@ -107,107 +94,129 @@ def fetch_search_results(base_url, query, total_pages=10, start_page=0, valid_pr
         logging.error("No valid proxies available. Exiting.")
         return results_data
 
+    guard = PaginationGuard(query)
     with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for page in range(start_page, start_page + total_pages):
-            futures.append(executor.submit(fetch_page_results, base_url, query, page, valid_proxies))
+        futures = {executor.submit(fetch_page_results, base_url, query, page, valid_proxies): page
+                   for page in range(start_page, start_page + total_pages)}
 
         for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
+            if future.cancelled():
+                continue
             try:
                 page_results = future.result()
+                if guard.is_repeat(futures[future], page_results):
+                    guard.cancel_pending(futures)
+                    continue
                 results_data.extend(page_results)
-                logging.info(f"Fetched results: {page_results}")
+                logging.info(f"Fetched {len(page_results)} results from a page", extra={'event': 'page_fetched'})
+                logging.debug("Fetched results: %s", page_results)
             except Exception as e:
                 logging.error(f"Fetching results failed: {e}")
 
+    guard.report()
     return results_data
 
 def fetch_page_results(base_url, query, page, valid_proxies):
     # Fetches search results from a single page of the specified website
+    with trace_page(page, site=base_url):
+        return fetch_page_with_browser(base_url, query, page, valid_proxies)
+
+def fetch_page_with_browser(base_url, query, page, valid_proxies):
+    # Drives a Chrome search for one page, retrying with another proxy on failure.
+    # Selenium is imported here so the browser stack only loads once a page is fetched.
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
     start = page * 10
     headers = {'User-Agent': get_random_user_agent()}
     
-    success = False
-    retries = 5
-    backoff = 1
     results_data = []
+    RETRY_POLICY.record_request()
     
-    while not success and retries > 0:
-        proxy = get_random_proxy(valid_proxies)
+    for attempt_number in range(1, RETRY_POLICY.max_attempts + 1):
+        with span('proxy_select', pool_size=len(valid_proxies)) as selection:
+            proxy = get_random_proxy(valid_proxies)
+            selection['proxy'] = proxy
         proxies = {'http': f'http://{proxy}', 'https': f'https://{proxy}'} if proxy else None
         try:
-            options = webdriver.ChromeOptions()
-            options.add_argument(f'user-agent={get_random_user_agent()}')
-            if proxy:
-                options.add_argument(f'--proxy-server={proxy}')
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            driver.get(base_url)
-            
-            # Wait for the search bar to be present
-            for _ in range(10):  # Retry up to 10 times (about 10 seconds)
-                try:
-                    search_bar = driver.find_element(By.NAME, 'q')
-                    break
-                except:
-                    sleep(1)
-            else:
-                raise Exception("Search bar not found")
+            with span('chrome_start', proxy=proxy or 'direct'):
+                options = webdriver.ChromeOptions()
+                options.add_argument(f'user-agent={get_random_user_agent()}')
+                if proxy:
+                    options.add_argument(f'--proxy-server={proxy}')
+                driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
 
-            # Perform search
-            search_bar.send_keys(query)
-            search_bar.send_keys(Keys.RETURN)
-            
-            sleep(random.uniform(2, 5))  # Wait for the results to load
-            
-            html_content = driver.page_source
-            driver.quit()
+            with span('http_attempt', attempt=attempt_number, proxy=proxy or 'direct'):
+                driver.get(base_url)
+                
+                # Wait for the search bar to be present
+                for _ in range(10):  # Retry up to 10 times (about 10 seconds)
+                    try:
+                        search_bar = driver.find_element(By.NAME, 'q')
+                        break
+                    except:
+                        sleep(1)
+                else:
+                    raise Exception("Search bar not found")
+
+                # Perform search
+                search_bar.send_keys(query)
+                search_bar.send_keys(Keys.RETURN)
+                
+                sleep(random.uniform(2, 5))  # Wait for the results to load
+                
+                html_content = driver.page_source
+                driver.quit()
             
             logging.info(f"Fetched HTML content for page {page}")
             results_data = parse_results(html_content)
+            break
             
-            success = True
-            
-        except requests.exceptions.ConnectionError:
-            logging.error(f"Connection refused for proxy {proxy}")
-            retries -= 1
-            if proxy in valid_proxies:
-                valid_proxies.remove(proxy)
-                logging.info(f"Removed invalid proxy: {proxy}")
-            sleep(backoff)
-            backoff *= 2
         except Exception as e:
-            retries -= 1
-            logging.error(f"Request failed (retries left: {retries}): {e}")
+            # Browser failures are almost always the proxy, so the proxy is dropped whatever the error class
+            error_class = classify_error(e)
+            delay = RETRY_POLICY.next_delay(error_class, attempt_number)
+            if error_class == CONNECT:
+                logging.error(f"Connection refused for proxy {proxy}")
+            else:
+                retries_left = RETRY_POLICY.max_attempts - attempt_number if delay is not None else 0
+                logging.error(f"Request failed (retries left: {retries_left}): {e}")
             if proxy in valid_proxies:
                 valid_proxies.remove(proxy)
                 logging.info(f"Removed invalid proxy: {proxy}")
-            sleep(backoff)
-            backoff *= 2
+            if delay is None:
+                break
+            with span('backoff', seconds=delay):
+                sleep(delay)
     
     return results_data
 
 def parse_results(html):
     # Parses HTML content to extract search results
-    soup = BeautifulSoup(html, 'html.parser')
-    search_results = soup.find_all('div', class_='tF2Cxc')
-    
-    if not search_results:
-        logging.warning("No search results found on the page.")
-    
-    results_data = []
-    for result in search_results:
-        title = result.find('h3', class_='LC20lb').text.strip() if result.find('h3', class_='LC20lb') else "Title not found"
-        link = result.find('a')['href'] if result.find('a') else "Link not found"
+    with span('parse', html_bytes=len(html)):
+        soup = BeautifulSoup(html, 'html.parser')
+        search_results = soup.find_all('div', class_='tF2Cxc')
         
-        results_data.append({'Title': title, 'Link': link})
-    
-    return results_data
+        if not search_results:
+            logging.warning("No search results found on the page.")
+        
+        results_data = []
+        for result in search_results:
+            title = result.find('h3', class_='LC20lb').text.strip() if result.find('h3', class_='LC20lb') else "Title not found"
+            link = result.find('a')['href'] if result.find('a') else "Link not found"
+            
+            results_data.append({'Title': title, 'Link': link})
+        
+        return results_data
 
 def write_to_csv(results_data, filename):
     # Writes search results to a CSV file
     file_exists = os.path.isfile(filename)
     
-    with open(filename, mode='a', newline='', encoding='utf-8') as file:
+    with span('write', rows=len(results_data)), open(filename, mode='a', newline='', encoding='utf-8') as file:
         fieldnames = ['Title', 'Link']
         writer = csv.DictWriter(file, fieldnames=fieldnames)
         
@@ -252,54 +261,64 @@ def get_page_input():
         else:
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl search results for the NYU HPC acknowledgment")
+    parser.add_argument('--profile', action='store_true', help="Profile the run, writing collapsed stacks and an allocation report to logs/")
+    parser.add_argument('--trace', action='store_true', help="Write per-page tracing spans to a Chrome trace file in logs/")
+    return parser.parse_args()
+
 def main():
     # Main function to manage fetching search results
-    query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
-    websites = [
-        "https://scholar.google.com"
-    ]
+    setup_logging()
+    args = parse_args()
+    with profile_run(args.profile, sys.modules[__name__], 'logs', 'generalized_work'), tracing_run(args.trace):
+        query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
+        websites = [
+            "https://scholar.google.com"
+        ]
     
-    progress = load_progress()
-    results_data = []
+        progress = load_progress()
+        results_data = []
     
-    if progress and progress['query'] == query:
-        print(f"Last saved progress found.")
-        if get_user_input():
-            start_page = progress['current_page']
-            total_pages = int(input("Enter the total number of pages to crawl: ").strip())
-            results_data = progress['results_data']
-            logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+        if progress and progress['query'] == query:
+            print(f"Last saved progress found.")
+            if get_user_input():
+                start_page = progress['current_page']
+                total_pages = int(input("Enter the total number of pages to crawl: ").strip())
+                results_data = progress['results_data']
+                logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+            else:
+                start_page, total_pages = get_page_input()
+                results_data = []
+                logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
         else:
+            print("No last saved progress found. Please enter the starting page and total number of pages.")
             start_page, total_pages = get_page_input()
             results_data = []
             logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
-    else:
-        print("No last saved progress found. Please enter the starting page and total number of pages.")
-        start_page, total_pages = get_page_input()
-        results_data = []
-        logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
 
-    with ThreadPoolExecutor(max_workers=len(websites)) as executor:
-        futures = []
-        for website in websites:
-            futures.append(executor.submit(fetch_search_results, website, query, total_pages, start_page=start_page))
+        with ThreadPoolExecutor(max_workers=len(websites)) as executor:
+            futures = []
+            for website in websites:
+                futures.append(executor.submit(fetch_search_results, website, query, total_pages, start_page=start_page))
 
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
-            try:
-                site_results = future.result()
-                results_data.extend(site_results)
-                logging.info(f"Fetched results: {site_results}")
-            except Exception as e:
-                logging.error(f"Fetching results failed: {e}")
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
+                try:
+                    site_results = future.result()
+                    results_data.extend(site_results)
+                    logging.info(f"Fetched {len(site_results)} results from a site", extra={'event': 'site_fetched'})
+                    logging.debug("Fetched results: %s", site_results)
+                except Exception as e:
+                    logging.error(f"Fetching results failed: {e}")
     
-    if results_data:
-        logging.info(f"Fetched {len(results_data)} results.")
-    else:
-        logging.warning("No results fetched.")
+        if results_data:
+            logging.info(f"Fetched {len(results_data)} results.")
+        else:
+            logging.warning("No results fetched.")
     
-    csv_filename = f"{datetime.now().strftime('%Y-%m-%d')}_results.csv"
-    write_to_csv(results_data, csv_filename)
-    logging.info(f"Results written to CSV: {csv_filename}")
+        csv_filename = f"{datetime.now().strftime('%Y-%m-%d')}_results.csv"
+        write_to_csv(results_data, csv_filename)
+        logging.info(f"Results written to CSV: {csv_filename}")
 
 if __name__ == "__main__":
     main()
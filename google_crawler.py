@@ -1,32 +1,20 @@
 import os
+import sys
+import argparse
 import requests
 from bs4 import BeautifulSoup
-import csv
 import time
 import random
 import logging
 import json
-from fake_useragent import UserAgent
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
-
-# Ensure the logs and results directories exist
-os.makedirs('logs', exist_ok=True)
-os.makedirs('results', exist_ok=True)
-
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
-
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Generate a random user agent
-user_agent_cache = UserAgent()
-def get_random_user_agent():
-    return user_agent_cache.random
+from crawler_setup import setup_logging, get_random_user_agent
+from crawl_profiler import profile_run
+from page_fingerprint import PaginationGuard
+from results_csv import append_rows
+from retry_policy import RETRY_POLICY, PARSE_EMPTY, PROXY_ERRORS, classify_error, retry_after_of
 
 def scrape_proxies():
     # Scrapes proxies from multiple free proxy listing websites
@@ -99,19 +87,26 @@ def fetch_search_results(base_url, query, query_param, total_pages=10, start_pag
         logging.error("No valid proxies available. Exiting.")
         return results_data
 
+    guard = PaginationGuard(query)
     with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for page in range(start_page, start_page + total_pages):
-            futures.append(executor.submit(fetch_page_results, base_url, query, query_param, page, valid_proxies))
+        futures = {executor.submit(fetch_page_results, base_url, query, query_param, page, valid_proxies): page
+                   for page in range(start_page, start_page + total_pages)}
 
         for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
+            if future.cancelled():
+                continue
             try:
                 page_results = future.result()
+                if guard.is_repeat(futures[future], page_results):
+                    guard.cancel_pending(futures)
+                    continue
                 results_data.extend(page_results)
-                logging.info(f"Fetched results: {page_results}")
+                logging.info(f"Fetched {len(page_results)} results from a page", extra={'event': 'page_fetched'})
+                logging.debug("Fetched results: %s", page_results)
             except Exception as e:
                 logging.error(f"Fetching results failed: {e}")
 
+    guard.report()
     return results_data
 
 def fetch_page_results(base_url, query, query_param, page, valid_proxies):
@@ -121,10 +116,11 @@ def fetch_page_results(base_url, query, query_param, page, valid_proxies):
     headers = {'User-Agent': get_random_user_agent()}
     
     success = False
-    retries = 5
     results_data = []
+    error_class = None
+    RETRY_POLICY.record_request()
     
-    while not success and retries > 0:
+    for attempt_number in range(1, RETRY_POLICY.max_attempts + 1):
         proxy = get_random_proxy(valid_proxies)
         proxies = {'http': f'http://{proxy}', 'https': f'https://{proxy}'} if proxy else None
         try:
@@ -134,19 +130,33 @@ def fetch_page_results(base_url, query, query_param, page, valid_proxies):
             html_content = response.text
             logging.info(f"Fetched HTML content for page {page}")
             results_data = parse_results(html_content)
+            if not results_data:
+                error_class = PARSE_EMPTY
+                delay = RETRY_POLICY.next_delay(error_class, attempt_number)
+                success = delay is None
+                if success:
+                    break
+                logging.warning(f"Page {page} parsed to no results, fetching it again in {delay:.0f} seconds")
+                time.sleep(delay)
+                continue
             
             success = True
+            break
             
         except requests.RequestException as e:
-            retries -= 1
-            logging.error(f"Request failed (retries left: {retries}): {e}")
-            if proxy in valid_proxies:
+            error_class = classify_error(e)
+            delay = RETRY_POLICY.next_delay(error_class, attempt_number, retry_after_of(e))
+            retries_left = RETRY_POLICY.max_attempts - attempt_number if delay is not None else 0
+            logging.error(f"Request failed (retries left: {retries_left}): {e}")
+            if error_class in PROXY_ERRORS and proxy in valid_proxies:
                 valid_proxies.remove(proxy)
                 logging.info(f"Removed invalid proxy: {proxy}")
-            time.sleep(random.uniform(5, 15))
+            if delay is None:
+                break
+            time.sleep(delay)
     
-    # If all retries fail, attempt to fetch without proxy
-    if not success:
+    # If all retries fail, attempt to fetch without proxy, which only helps when the proxies were the problem
+    if not success and error_class in PROXY_ERRORS:
         try:
             response = requests.get(base_url, params=params, headers=headers, timeout=10)
             response.raise_for_status()
@@ -170,8 +180,10 @@ def parse_results(html):
     for result in search_results:
         title = result.find('h3', class_='LC20lb').text.strip() if result.find('h3', class_='LC20lb') else "Title not found"
         link = result.a['href'] if result.a else "Link not found"
+        snippet_tag = result.find('div', class_='VwiC3b')
+        snippet = snippet_tag.get_text(' ', strip=True) if snippet_tag else ""
         
-        results_data.append({'Title': title, 'Link': link})
+        results_data.append({'Title': title, 'Link': link, 'Snippet': snippet})
     
     return results_data
 
@@ -179,17 +191,8 @@ def write_to_csv(results_data):
     # Writes search results to a CSV file
     csv_date = datetime.now().strftime("%Y-%m-%d")
     csv_filename = f"{csv_date}_results.csv"
-    file_exists = os.path.isfile(csv_filename)
-    
-    with open(csv_filename, mode='a', newline='', encoding='utf-8') as file:
-        fieldnames = ['Title', 'Link']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        
-        if not file_exists:
-            writer.writeheader()
-        
-        for result in results_data:
-            writer.writerow({field: result[field] for field in fieldnames})
+    # Files written before snippets were kept have no Snippet column, rows appended to them keep the old layout
+    append_rows(results_data, csv_filename, ['Title', 'Link', 'Snippet'])
 
 def save_progress(base_url, query, query_param, total_pages, current_page, results_data):
     # Saves the current progress to a JSON file
@@ -234,39 +237,47 @@ def get_page_input():
         else:
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl search results for the NYU HPC acknowledgment")
+    parser.add_argument('--profile', action='store_true', help="Profile the run, writing collapsed stacks and an allocation report to logs/")
+    return parser.parse_args()
+
 def main():
     # Main function to manage fetching search results
-    query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
-    base_url = "https://www.google.com/search"
-    query_param = 'q'
+    setup_logging()
+    args = parse_args()
+    with profile_run(args.profile, sys.modules[__name__], 'logs', 'google_crawler'):
+        query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
+        base_url = "https://www.google.com/search"
+        query_param = 'q'
     
-    progress = load_progress()
-    if progress and progress['query'] == query:
-        print(f"Last saved page number: {progress['current_page']}")
-        if get_user_input():
-            start_page = progress['current_page']
-            total_pages = int(input("Enter the total number of pages to crawl: ").strip())
-            results_data = progress['results_data']
-            logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+        progress = load_progress()
+        if progress and progress['query'] == query:
+            print(f"Last saved page number: {progress['current_page']}")
+            if get_user_input():
+                start_page = progress['current_page']
+                total_pages = int(input("Enter the total number of pages to crawl: ").strip())
+                results_data = progress['results_data']
+                logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+            else:
+                start_page, total_pages = get_page_input()
+                results_data = []
+                logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
         else:
+            print("No last saved page found. Please enter the starting page and total number of pages.")
             start_page, total_pages = get_page_input()
             results_data = []
             logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
-    else:
-        print("No last saved page found. Please enter the starting page and total number of pages.")
-        start_page, total_pages = get_page_input()
-        results_data = []
-        logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
     
-    results_data.extend(fetch_search_results(base_url, query, query_param, total_pages, start_page=start_page))
+        results_data.extend(fetch_search_results(base_url, query, query_param, total_pages, start_page=start_page))
     
-    if results_data:
-        logging.info(f"Fetched {len(results_data)} results.")
-    else:
-        logging.warning("No results fetched.")
+        if results_data:
+            logging.info(f"Fetched {len(results_data)} results.")
+        else:
+            logging.warning("No results fetched.")
     
-    write_to_csv(results_data)
-    logging.info("Results written to CSV")
+        write_to_csv(results_data)
+        logging.info("Results written to CSV")
 
 if __name__ == "__main__":
     main()
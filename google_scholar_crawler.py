@@ -1,45 +1,49 @@
 import os
+import sys
+import argparse
 import csv
-import random
 import logging
 import json
 import asyncio
 import aiohttp
 from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
 from datetime import datetime
+from crawler_setup import setup_logging, get_random_user_agent
+from crawl_profiler import profile_run
+from retry_policy import RETRY_POLICY, classify_error, retry_after_of
+from publication_records import PublicationRecord, RecordBatch, to_dicts
+from block_detection import BLOCKED, BlockedPageError, classify_body
+from crawl_pipeline import run_pipeline, fetch_stage, parse_stage, dedup_stage, sink_stage
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+from near_dedup import load_near_duplicate_index, filter_near_duplicates
+from results_csv import append_rows
 
-# Ensure the logs and results directories exist
-os.makedirs('logs', exist_ok=True)
-os.makedirs('results', exist_ok=True)
-
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"logs/{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
-
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Generate a random user agent
-user_agent_cache = UserAgent()
-def get_random_user_agent():
-    return user_agent_cache.random
+# Scholar serves at most 20 results per page through the num parameter
+RESULTS_PER_PAGE = 20
+# Progress files without a results_per_page entry were saved at Scholar's default page size
+LEGACY_RESULTS_PER_PAGE = 10
 
 async def fetch_page(session, url, params, headers):
-    retries = 5
-    while retries > 0:
+    RETRY_POLICY.record_request()
+    for attempt_number in range(1, RETRY_POLICY.max_attempts + 1):
         try:
             async with session.get(url, params=params, headers=headers, timeout=10) as response:
                 response.raise_for_status()
                 html_content = await response.text()
-                return html_content
-        except (aiohttp.ClientError, aiohttp.http_exceptions.HttpProcessingError, asyncio.TimeoutError) as e:
-            retries -= 1
-            logging.error(f"Request failed (retries left: {retries}): {e}")
-            await asyncio.sleep(random.uniform(5, 15))
+            verdict, marker = classify_body(html_content)
+            if verdict == BLOCKED:
+                page = params['start'] // RESULTS_PER_PAGE + 1
+                logging.warning(f"Page {page} blocked through direct: {marker}", extra={'event': 'page_blocked'})
+                raise BlockedPageError(page, None, marker)
+            return html_content
+        except (aiohttp.ClientError, aiohttp.http_exceptions.HttpProcessingError, asyncio.TimeoutError, BlockedPageError) as e:
+            delay = RETRY_POLICY.next_delay(classify_error(e), attempt_number, retry_after_of(e))
+            retries_left = RETRY_POLICY.max_attempts - attempt_number if delay is not None else 0
+            logging.error(f"Request failed (retries left: {retries_left}): {e}")
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
     return None
 
 def parse_mla_citation(html):
@@ -56,30 +60,37 @@ def parse_results(html):
     if not search_results:
         logging.warning("No search results found on the page.")
     
-    results_data = []
+    results_data = RecordBatch()
     for result in search_results:
         title_tag = result.find('h3', class_='gs_rt')
         title = title_tag.text.strip() if title_tag else "Title not found"
         link = title_tag.a['href'] if title_tag and title_tag.a else "Link not found"
         
+        snippet_tag = result.find('div', class_='gs_rs')
+        snippet = snippet_tag.get_text(' ', strip=True) if snippet_tag else ""
+        
         mla_citation = parse_mla_citation(str(result))
         
-        results_data.append({'Title': title, 'Link': link, 'MLA Citation': mla_citation})
+        results_data.append(PublicationRecord(title, link, mla_citation, snippet))
     
-    logging.info(f"Parsed results: {results_data}")
+    logging.info(f"Parsed {len(results_data)} results", extra={'event': 'page_parsed'})
+    logging.debug("Parsed results: %s", results_data)
     return results_data
 
+BASE_URL = "https://scholar.google.com/scholar"
+QUERY_PARAM = 'q'
+
+def page_params(query, page):
+    return {QUERY_PARAM: query, 'start': (page - 1) * RESULTS_PER_PAGE, 'num': RESULTS_PER_PAGE}
+
 async def fetch_search_results(session, query, start_page, end_page, progress_bar):
-    base_url = "https://scholar.google.com/scholar"
-    query_param = 'q'
     headers = {'User-Agent': get_random_user_agent()}
 
-    results_data = []
+    results_data = RecordBatch()
 
     tasks = []
     for page in range(start_page, end_page + 1):
-        params = {query_param: query, 'start': (page - 1) * 10}
-        tasks.append(fetch_page(session, base_url, params, headers))
+        tasks.append(fetch_page(session, BASE_URL, page_params(query, page), headers))
 
     for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=f"Fetching pages {start_page} to {end_page}", leave=True):
         page_content = await task
@@ -99,35 +110,40 @@ def load_existing_csv_data(csv_filename):
                 existing_data.add((row['Title'], row['Link'], row['MLA Citation']))
     return existing_data
 
-def write_to_csv(results_data, csv_filename):
+def load_csv_index(csv_filename):
+    # Reads a results CSV once per run: its exact (Title, Link, MLA Citation) keys and a
+    # near-duplicate index of its titles, both kept up to date as rows are written
+    return load_existing_csv_data(csv_filename), load_near_duplicate_index(csv_filename)
+
+def write_to_csv(results_data, csv_filename, csv_index=None):
     if not results_data:
         logging.warning("No data to write to CSV.")
         return
 
-    existing_data = load_existing_csv_data(csv_filename)
+    existing_data, near_duplicate_index = csv_index or load_csv_index(csv_filename)
     
     new_data = [result for result in results_data if (result['Title'], result['Link'], result['MLA Citation']) not in existing_data]
+    existing_data.update((result['Title'], result['Link'], result['MLA Citation']) for result in new_data)
+
+    # Drop records whose title is a near-duplicate of one already saved (truncated or reworded titles)
+    new_data = filter_near_duplicates(new_data, near_duplicate_index)
 
     if not new_data:
         logging.info("No new data to write to CSV.")
         return
-    
-    with open(csv_filename, mode='a', newline='', encoding='utf-8') as file:
-        fieldnames = ['Title', 'Link', 'MLA Citation']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        
-        if not os.path.exists(csv_filename) or os.path.getsize(csv_filename) == 0:
-            writer.writeheader()
-        
-        for result in new_data:
-            writer.writerow({field: result[field] for field in fieldnames})
+    append_to_csv(new_data, csv_filename)
+
+def append_to_csv(new_data, csv_filename):
+    # Appends rows already checked against the file, keeping its column layout
+    append_rows(new_data, csv_filename, ['Title', 'Link', 'MLA Citation', 'Snippet'])
 
 def save_progress(query, total_pages, current_page, results_data):
     progress = {
         'query': query,
         'total_pages': total_pages,
         'current_page': current_page,
-        'results_data': results_data
+        'results_per_page': RESULTS_PER_PAGE,
+        'results_data': to_dicts(results_data)
     }
     with open('progress.json', 'w') as f:
         json.dump(progress, f)
@@ -136,10 +152,22 @@ def load_progress():
     try:
         with open('progress.json', 'r') as f:
             progress = json.load(f)
-            return progress
+            return convert_progress_pages(progress)
     except FileNotFoundError:
         return None
 
+def convert_progress_pages(progress):
+    # Renumbers a saved page (counted from 1) to the current page size, starting at the page
+    # that holds its first result
+    saved_per_page = progress.get('results_per_page', LEGACY_RESULTS_PER_PAGE)
+    if saved_per_page != RESULTS_PER_PAGE:
+        offset = (progress['current_page'] - 1) * saved_per_page
+        progress['current_page'] = offset // RESULTS_PER_PAGE + 1
+        progress['total_pages'] = -(-progress['total_pages'] * saved_per_page // RESULTS_PER_PAGE)
+        progress['results_per_page'] = RESULTS_PER_PAGE
+        logging.info(f"Converted saved progress from {saved_per_page} to {RESULTS_PER_PAGE} results per page")
+    return progress
+
 def get_user_input():
     while True:
         resume = input("Do you want to resume from the last saved page? (y/n): ").strip().lower()
@@ -159,57 +187,111 @@ def get_page_input():
         else:
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
-async def crawl_pages(query, start_page, end_page, results_data, progress_bar):
+async def crawl_pages(query, start_page, end_page, progress_bar):
+    async with aiohttp.ClientSession() as session:
+        return await fetch_search_results(session, query, start_page, end_page, progress_bar)
+
+def run_crawl_pages(query, start_page, end_page, progress_bar):
+    return asyncio.run(crawl_pages(query, start_page, end_page, progress_bar))
+
+async def stream_pages(query, start_page, end_page, csv_filenames, progress_bar, resumed_results=()):
+    # Streams pages through fetch, parse, dedup and CSV sink stages, so results reach the
+    # files as they arrive and a slow write holds the fetches back. Results carried over from
+    # a resumed run are written first. Returns the rows written.
+    headers = {'User-Agent': get_random_user_agent()}
+    # One index over every target file, built once: a record saved in either is not written again
+    near_duplicate_index = load_near_duplicate_index(csv_filenames)
+    written = 0
+
+    def write(batch):
+        nonlocal written
+        for csv_filename in csv_filenames:
+            append_to_csv(batch, csv_filename)
+        written += len(batch)
+        logging.info(f"Wrote {len(batch)} results", extra={'event': 'batch_written'})
+
+    resumed = RecordBatch(filter_near_duplicates(resumed_results, near_duplicate_index))
+    if resumed:
+        write(resumed)
+
     async with aiohttp.ClientSession() as session:
-        page_results = await fetch_search_results(session, query, start_page, end_page, progress_bar)
-        results_data.extend(page_results)
+        async def fetch(page):
+            html_content = await fetch_page(session, BASE_URL, page_params(query, page), headers)
+            progress_bar.update(1)
+            return html_content
+
+        await run_pipeline(range(start_page, end_page + 1),
+                           fetch_stage(fetch),
+                           parse_stage(parse_results),
+                           dedup_stage(near_duplicate_index),
+                           sink_stage(write))
+    return written
 
-def run_crawl_pages(query, start_page, end_page, results_data, progress_bar):
-    asyncio.run(crawl_pages(query, start_page, end_page, results_data, progress_bar))
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl search results for the NYU HPC acknowledgment")
+    parser.add_argument('--profile', action='store_true', help="Profile the run, writing collapsed stacks and an allocation report to logs/")
+    parser.add_argument('--stream', action='store_true', help="Write results to CSV as pages arrive instead of at the end of the crawl")
+    return parser.parse_args()
 
 async def main():
-    query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
-
-    progress = load_progress()
-    if progress and progress['query'] == query:
-        print(f"Last saved page number: {progress['current_page']}")
-        if get_user_input():
-            start_page = progress['current_page']
-            results_data = progress['results_data']
-            total_pages = progress['total_pages']
-            logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+    setup_logging('logs')
+    os.makedirs('results', exist_ok=True)
+    args = parse_args()
+    with profile_run(args.profile, sys.modules[__name__], 'logs', 'google_scholar_crawler'):
+        query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
+
+        progress = load_progress()
+        if progress and progress['query'] == query:
+            print(f"Last saved page number: {progress['current_page']}")
+            if get_user_input():
+                start_page = progress['current_page']
+                results_data = RecordBatch(progress['results_data'])
+                total_pages = progress['total_pages']
+                logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+            else:
+                start_page, total_pages = get_page_input()
+                results_data = RecordBatch()
+                logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
         else:
+            print("No last saved page found. Please enter the starting page and total number of pages.")
             start_page, total_pages = get_page_input()
-            results_data = []
+            results_data = RecordBatch()
             logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
-    else:
-        print("No last saved page found. Please enter the starting page and total number of pages.")
-        start_page, total_pages = get_page_input()
-        results_data = []
-        logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
 
-    progress_bar = tqdm(total=total_pages, desc="Overall Progress", leave=True)
+        progress_bar = tqdm(total=total_pages, desc="Overall Progress", leave=True)
+
+        middle_page = start_page + (total_pages // 2) - 1
+        end_page = start_page + total_pages - 1
+        csv_date = datetime.now().strftime("%Y-%m-%d")
+        csv_filenames = [f'results/{csv_date}_results.csv', 'results/google_scholar.csv']
 
-    middle_page = start_page + (total_pages // 2) - 1
-    end_page = start_page + total_pages - 1
+        if args.stream:
+            written = await stream_pages(query, start_page, end_page, csv_filenames, progress_bar, results_data)
+            logging.info(f"Fetched and wrote {written} new results.")
+            save_progress(query, total_pages, end_page, RecordBatch())
+            progress_bar.close()
+            return
 
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        executor.submit(run_crawl_pages, query, start_page, middle_page, results_data, progress_bar)
-        executor.submit(run_crawl_pages, query, middle_page + 1, end_page, results_data, progress_bar)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            halves = [executor.submit(run_crawl_pages, query, start_page, middle_page, progress_bar),
+                      executor.submit(run_crawl_pages, query, middle_page + 1, end_page, progress_bar)]
 
-    # Wait for all threads to complete
-    executor.shutdown(wait=True)
+        # Each half fills its own batch, they are merged once both threads are done
+        for half in halves:
+            try:
+                results_data.extend(half.result())
+            except Exception as e:
+                logging.error(f"Crawling pages failed: {e}")
 
-    if results_data:
-        logging.info(f"Fetched {len(results_data)} results.")
-    else:
-        logging.warning("No results fetched.")
+        if results_data:
+            logging.info(f"Fetched {len(results_data)} results.")
+        else:
+            logging.warning("No results fetched.")
     
-    csv_date = datetime.now().strftime("%Y-%m-%d")
-    write_to_csv(results_data, f'results/{csv_date}_results.csv')
-    write_to_csv(results_data, 'results/google_scholar.csv')
-    save_progress(query, total_pages, end_page, results_data)
-    progress_bar.close()
+        for csv_filename in csv_filenames:
+            write_to_csv(results_data, csv_filename)
+        save_progress(query, total_pages, end_page, results_data)
+        progress_bar.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,32 +1,55 @@
 import os
+import sys
 import requests
 from bs4 import BeautifulSoup
-import csv
 import time
 import random
 import logging
 import json
-from fake_useragent import UserAgent
+import argparse
+from contextlib import ExitStack
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
+from crawler_setup import setup_logging, get_random_user_agent
+from query_planner import DEFAULT_FIRST_YEAR, RESULTS_PER_PAGE, parse_result_count, plan_year_windows, crawl_windows
+from crawl_preflight import MAX_WORKERS, preflight_query, size_crawl, allocate_budget
+from crawl_profiler import profile_run
+from crawl_tracing import span, trace_page, tracing_run
+from crawl_metrics import (REQUEST_LATENCY, REQUESTS, RETRIES, PROXY_POOL_SIZE, PROXIES_CHECKED, PROXIES_REMOVED,
+                           PARSE_SECONDS, PAGES_PENDING, RECORDS_WRITTEN, BREAKER_TRIPS, PAGES_RESCHEDULED, HEDGES,
+                           PAGE_VERDICTS, PAGINATION_REQUESTS_SAVED, RETRY_BUDGET_EXHAUSTED, DEFAULT_METRICS_PORT,
+                           host_of, start_metrics_server, dump_metrics)
+from circuit_breaker import (CircuitOpenError, BreakerRegistry, PROXY_FAILURE_THRESHOLD, PROXY_RESET_TIMEOUT,
+                             HOST_FAILURE_THRESHOLD, HOST_RESET_TIMEOUT)
+from hedging import HedgePolicy
+from page_fingerprint import PaginationGuard
+from publication_records import PublicationRecord, RecordBatch, to_dicts
+from incremental import INCREMENTAL_MAX_PAGES, KnownPublications, KnownRunDetector, date_sort_params
+from block_detection import BLOCKED, RESULTS, UNKNOWN, BlockedPageError, classify_body, classify_response
+from results_csv import append_rows
+from retry_policy import (RETRY_POLICY, PARSE_EMPTY, THROTTLED, PROXY_ERRORS, HOST_ERRORS, classify_error, classify_status,
+                          retry_after_of)
 
-# Ensure the logs and results directories exist
-os.makedirs('logs', exist_ok=True)
-os.makedirs('results', exist_ok=True)
+# Page size of progress files saved before it was recorded in them
+LEGACY_RESULTS_PER_PAGE = 10
+MAX_RESCHEDULES = 3  # Rounds of retrying pages deferred by an open circuit
+RESCHEDULE_MIN_WAIT = 5  # Seconds between rounds even when no circuit says how long to wait
+DEFAULT_QUERY = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
 
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"logs/{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
+def on_proxy_circuit_open(proxy):
+    BREAKER_TRIPS.labels(kind='proxy').inc()
+    PROXIES_REMOVED.inc()
+    logging.info(f"Removed invalid proxy: {proxy}")
 
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def on_host_circuit_open(host):
+    BREAKER_TRIPS.labels(kind='host').inc()
 
-# Generate a random user agent
-user_agent_cache = UserAgent()
-def get_random_user_agent():
-    return user_agent_cache.random
+PROXY_BREAKERS = BreakerRegistry(PROXY_FAILURE_THRESHOLD, PROXY_RESET_TIMEOUT, on_open=on_proxy_circuit_open)
+HOST_BREAKERS = BreakerRegistry(HOST_FAILURE_THRESHOLD, HOST_RESET_TIMEOUT, on_open=on_host_circuit_open)
+
+# Set by --hedge, page requests are sent without hedging otherwise
+hedge_policy = None
 
 def scrape_proxies():
     # Scrapes proxies from multiple free proxy listing websites
@@ -79,19 +102,33 @@ def get_valid_proxies(proxies):
             try:
                 if future.result():
                     valid_proxies.append(proxy)
+                    PROXIES_CHECKED.labels(result='valid').inc()
+                else:
+                    PROXIES_CHECKED.labels(result='invalid').inc()
             except Exception as e:
                 logging.error(f"Proxy validation failed: {e}")
+    PROXY_POOL_SIZE.set(len(valid_proxies))
     if not valid_proxies:
         logging.error("No valid proxies found.")
     return valid_proxies
 
-def get_random_proxy(valid_proxies):
-    # Selects a random proxy from the list of valid proxies
-    return random.choice(valid_proxies) if valid_proxies else None
+def select_proxy(valid_proxies, exclude=None):
+    # Selects a random proxy whose circuit lets a request through, failing fast when every circuit is open.
+    # Returns (proxy, permit); the permit is released once the request through the proxy is over.
+    candidates = PROXY_BREAKERS.available(valid_proxies)
+    PROXY_POOL_SIZE.set(len(candidates))
+    candidates = [proxy for proxy in candidates if proxy != exclude]
+    for proxy in random.sample(candidates, len(candidates)):
+        permit = PROXY_BREAKERS.get(proxy).acquire()
+        if permit is not None:
+            return proxy, permit
+    if valid_proxies:
+        raise CircuitOpenError('every proxy', min(PROXY_BREAKERS.get(proxy).retry_after() for proxy in valid_proxies))
+    return None, None
 
-def fetch_search_results(base_url, query, query_param, total_pages=10, start_page=0, valid_proxies=None):
+def fetch_search_results(base_url, query, query_param, total_pages=10, start_page=0, valid_proxies=None, extra_params=None, workers=5):
     # Fetches search results from a specified website for a given query starting from a specific page
-    results_data = []
+    results_data = RecordBatch()
     if valid_proxies is None:
         valid_proxies = get_valid_proxies(scrape_proxies())
     
@@ -99,84 +136,236 @@ def fetch_search_results(base_url, query, query_param, total_pages=10, start_pag
         logging.error("No valid proxies available. Exiting.")
         return results_data
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for page in range(start_page, start_page + total_pages):
-            futures.append(executor.submit(fetch_page_results, base_url, query, query_param, page, valid_proxies))
+    pages = list(range(start_page, start_page + total_pages))
+    guard = PaginationGuard(query)
+    for round_number in range(MAX_RESCHEDULES + 1):
+        if not pages:
+            break
+        if round_number:
+            wait_time = max(wait_time, RESCHEDULE_MIN_WAIT)
+            logging.warning(f"Rescheduling {len(pages)} pages deferred by an open circuit or a block page, waiting {wait_time:.0f} seconds")
+            time.sleep(wait_time)
+        deferred = []
+        wait_time = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_page_results, base_url, query, query_param, page, valid_proxies, extra_params): page
+                       for page in pages}
+            PAGES_PENDING.inc(len(futures))
 
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
-            try:
-                page_results = future.result()
-                results_data.extend(page_results)
-                logging.info(f"Fetched results: {page_results}")
-            except Exception as e:
-                logging.error(f"Fetching results failed: {e}")
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching search results", leave=True):
+                PAGES_PENDING.dec()
+                if future.cancelled():
+                    continue
+                try:
+                    page_results = future.result()
+                    if page_results is None:
+                        logging.error(f"Page {futures[future]} could not be fetched")
+                        continue
+                    if guard.is_repeat(futures[future], page_results):
+                        guard.cancel_pending(futures)
+                        continue
+                    results_data.extend(page_results)
+                    logging.info(f"Fetched {len(page_results)} results from a page", extra={'event': 'page_fetched'})
+                    logging.debug("Fetched results: %s", page_results)
+                except (CircuitOpenError, BlockedPageError) as e:
+                    # Failed fast without a request, or got a block page in place of results:
+                    # try the page again once the circuit can half-open
+                    deferred.append(futures[future])
+                    wait_time = max(wait_time, e.retry_after)
+                    PAGES_RESCHEDULED.inc()
+                except Exception as e:
+                    logging.error(f"Fetching results failed: {e}")
+        pages = guard.drop_pending(sorted(deferred))
 
+    PAGINATION_REQUESTS_SAVED.inc(guard.report())
+    if pages:
+        logging.error(f"Gave up on {len(pages)} pages after {MAX_RESCHEDULES} reschedules: {pages}")
     return results_data
 
-def fetch_page_results(base_url, query, query_param, page, valid_proxies):
-    # Fetches search results from a single page of the specified website
-    start = page * 10
-    params = {query_param: query, 'start': start}
+def build_page_params(query, query_param, page, extra_params=None):
+    # Builds the query string for one result page, asking for the largest page Scholar serves
+    params = {query_param: query, 'start': page * RESULTS_PER_PAGE, 'num': RESULTS_PER_PAGE}
+    if extra_params:
+        params.update(extra_params)
+    return params
+
+def fetch_page_results(base_url, query, query_param, page, valid_proxies, extra_params=None):
+    # Fetches search results from a single page of the specified website, fetching it again
+    # when it parses to no results and the byte scan cannot tell why, as with a truncated page.
+    # Returns None when the page could not be fetched at all.
+    params = build_page_params(query, query_param, page, extra_params)
+    with trace_page(page, query=query, **(extra_params or {})):
+        retry_number = 0
+        while True:
+            html_content = fetch_page_html(base_url, params, page, valid_proxies)
+            if not html_content:
+                return None
+            page_results = parse_results(html_content)
+            if page_results:
+                return page_results
+            verdict, marker = classify_body(html_content)
+            if verdict == RESULTS:
+                # Result markup the parser does not know, fetching the page again would not change that
+                logging.warning(f"Page {page} has results ({marker}) but none were parsed")
+                return page_results
+            if verdict != UNKNOWN:
+                # Scholar said the page has no results, fetching it again would not change that
+                return page_results
+            retry_number += 1
+            delay = RETRY_POLICY.next_delay(PARSE_EMPTY, retry_number)
+            if delay is None:
+                return page_results
+            logging.warning(f"Page {page} parsed to no results, fetching it again in {delay:.0f} seconds")
+            with span('backoff', seconds=delay, reason=PARSE_EMPTY):
+                time.sleep(delay)
+
+def select_alternate_proxy(valid_proxies, used_proxy):
+    # Picks the hedge's proxy. Returns (proxy, permit), the hedge releases the permit itself.
+    try:
+        proxy, permit = select_proxy(valid_proxies, exclude=used_proxy)
+    except CircuitOpenError:
+        return None
+    return (proxy, permit) if proxy else None
+
+def record_hedge_outcome(proxy, response, error):
+    # Settles a hedge request's proxy breaker, whether or not its response was the one used
+    breaker = PROXY_BREAKERS.get(proxy)
+    if error is not None:
+        if classify_error(error) in PROXY_ERRORS:
+            breaker.record_failure()
+    elif not response.ok:
+        if classify_status(response.status_code) in PROXY_ERRORS:
+            breaker.record_failure()
+    elif classify_response(response)[0] == BLOCKED:
+        breaker.trip()
+    else:
+        breaker.record_success()
+
+def check_page(response, page, proxy, host_breaker):
+    # Classifies a successful response before it is parsed. A block page cools the proxy
+    # that got it down at once and counts against the host, whose circuit paces every worker.
+    verdict, reason = classify_response(response)
+    PAGE_VERDICTS.labels(verdict=verdict).inc()
+    if verdict != BLOCKED:
+        return verdict
+    logging.warning(f"Page {page} blocked through {proxy or 'direct'}: {reason}", extra={'event': 'page_blocked'})
+    if proxy:
+        PROXY_BREAKERS.get(proxy).trip()
+    host_breaker.record_failure()
+    raise BlockedPageError(page, proxy, reason, host_breaker.retry_after())
+
+def send_request(base_url, params, headers, host, proxy, valid_proxies):
+    # Sends one page request, hedged through a second proxy when hedging is enabled.
+    # Returns (response, proxy that served it).
+    def send(request_proxy):
+        proxies = {'http': f'http://{request_proxy}', 'https': f'https://{request_proxy}'} if request_proxy else None
+        return requests.get(base_url, params=params, headers=headers, proxies=proxies, timeout=10)
+
+    if hedge_policy is None or not proxy:
+        return send(proxy), proxy
+    return hedge_policy.fetch(host, send, proxy, lambda used_proxy: select_alternate_proxy(valid_proxies, used_proxy),
+                              record_hedge_outcome)
+
+def fetch_page_html(base_url, params, page, valid_proxies):
+    # Fetches the HTML of a single result page, rotating proxies between the retries the retry policy allows
     headers = {'User-Agent': get_random_user_agent()}
+    host = host_of(base_url)
+    host_breaker = HOST_BREAKERS.get(host)
+    RETRY_POLICY.record_request()
+    error_class = None
     
-    success = False
-    retries = 5
-    results_data = []
-    
-    while not success and retries > 0:
-        proxy = get_random_proxy(valid_proxies)
-        proxies = {'http': f'http://{proxy}', 'https': f'https://{proxy}'} if proxy else None
-        try:
-            response = requests.get(base_url, params=params, headers=headers, proxies=proxies, timeout=10)
-            response.raise_for_status()
-            
-            html_content = response.text
-            logging.info(f"Fetched HTML content for page {page}")
-            results_data = parse_results(html_content)
-            
-            success = True
-            
-        except requests.RequestException as e:
-            retries -= 1
-            logging.error(f"Request failed for page {page} (retries left: {retries}): {e}")
-            if response.status_code == 429:
-                wait_time = random.uniform(30, 60)  # Wait longer before retrying
-                logging.warning(f"Too many requests. Waiting for {wait_time} seconds before retrying.")
-                time.sleep(wait_time)
-            else:
-                if proxy in valid_proxies:
-                    valid_proxies.remove(proxy)
-                    logging.info(f"Removed invalid proxy: {proxy}")
-                time.sleep(random.uniform(5, 15))  # Random sleep time to mimic human actions
+    for attempt_number in range(1, RETRY_POLICY.max_attempts + 1):
+        # The attempt's circuit permits are released when it ends, whatever the outcome, so a failure
+        # recorded against one breaker does not leave a half-open trial slot taken on the other
+        with ExitStack() as permits:
+            permits.enter_context(host_breaker.check())
+            with span('proxy_select', pool_size=len(valid_proxies)) as selection:
+                proxy, proxy_permit = select_proxy(valid_proxies)
+                selection['proxy'] = proxy
+            if proxy_permit is not None:
+                permits.enter_context(proxy_permit)
+            try:
+                with span('http_attempt', attempt=attempt_number, proxy=proxy or 'direct') as attempt:
+                    with REQUEST_LATENCY.labels(host=host, proxy=proxy or 'direct').time():
+                        response, proxy = send_request(base_url, params, headers, host, proxy, valid_proxies)
+                    attempt['status'] = response.status_code
+                    attempt['served_by'] = proxy
+                    REQUESTS.labels(host=host, status=response.status_code).inc()
+                    response.raise_for_status()
+                    attempt['verdict'] = check_page(response, page, proxy, host_breaker)
+                
+                host_breaker.record_success()
+                if proxy:
+                    PROXY_BREAKERS.get(proxy).record_success()
+                logging.info(f"Fetched HTML content for page {page}")
+                return response.text
+                
+            except requests.RequestException as e:
+                error_class = classify_error(e)
+                if e.response is None:
+                    REQUESTS.labels(host=host, status='error').inc()
+                if error_class in HOST_ERRORS:
+                    # The host answered and refused us, blame the host rather than the proxy
+                    host_breaker.record_failure()
+                elif proxy and error_class in PROXY_ERRORS:
+                    PROXY_BREAKERS.get(proxy).record_failure()
+
+                delay = RETRY_POLICY.next_delay(error_class, attempt_number, retry_after_of(e))
+                retries_left = RETRY_POLICY.max_attempts - attempt_number if delay is not None else 0
+                logging.error(f"Request failed for page {page} (retries left: {retries_left}): {e}")
+        if delay is None:
+            break
+        RETRIES.labels(host=host, error=error_class).inc()
+        if error_class == THROTTLED:
+            logging.warning(f"Too many requests. Waiting for {delay:.0f} seconds before retrying.")
+        with span('backoff', seconds=delay, reason=error_class):
+            time.sleep(delay)
     
-    # If all retries fail, attempt to fetch without proxy
-    if not success:
+    # A request without proxy only helps when the proxies were the problem
+    if error_class not in PROXY_ERRORS:
+        return None
+    with host_breaker.check():
         try:
-            response = requests.get(base_url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            html_content = response.text
+            with span('http_attempt', attempt='final', proxy='direct') as attempt:
+                with REQUEST_LATENCY.labels(host=host, proxy='direct').time():
+                    response = requests.get(base_url, params=params, headers=headers, timeout=10)
+                attempt['status'] = response.status_code
+                REQUESTS.labels(host=host, status=response.status_code).inc()
+                response.raise_for_status()
+                attempt['verdict'] = check_page(response, page, None, host_breaker)
+            host_breaker.record_success()
             logging.info(f"Fetched HTML content for page {page} without proxy")
-            results_data = parse_results(html_content)
+            return response.text
         except requests.RequestException as e:
+            host_breaker.record_failure()
+            if e.response is None:
+                REQUESTS.labels(host=host, status='error').inc()
             logging.error(f"Final request failed: {e}")
 
-    return results_data
+    return None
 
 def parse_results(html):
     # Parses HTML content to extract search results from Google
+    with PARSE_SECONDS.time(), span('parse', html_bytes=len(html)) as parse:
+        results_data = _parse_results(html)
+        parse['results'] = len(results_data)
+        return results_data
+
+def _parse_results(html):
     soup = BeautifulSoup(html, 'html.parser')
     search_results = soup.find_all('div', class_='tF2Cxc')
     
     if not search_results:
         logging.warning("No search results found on the page.")
     
-    results_data = []
+    results_data = RecordBatch()
     for result in search_results:
         title = result.find('h3', class_='LC20lb').text.strip() if result.find('h3', class_='LC20lb') else "Title not found"
         link = result.a['href'] if result.a else "Link not found"
+        snippet_tag = result.find('div', class_='VwiC3b')
+        snippet = snippet_tag.get_text(' ', strip=True) if snippet_tag else ""
         
-        results_data.append({'Title': title, 'Link': link})
+        results_data.append(PublicationRecord(title, link, snippet=snippet))
     
     return results_data
 
@@ -184,17 +373,10 @@ def write_to_csv(results_data):
     # Writes search results to a CSV file
     csv_date = datetime.now().strftime("%Y-%m-%d")
     csv_filename = f"results/{csv_date}_results.csv"
-    file_exists = os.path.isfile(csv_filename)
-    
-    with open(csv_filename, mode='a', newline='', encoding='utf-8') as file:
-        fieldnames = ['Title', 'Link']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        
-        if not file_exists:
-            writer.writeheader()
-        
-        for result in results_data:
-            writer.writerow({field: result[field] for field in fieldnames})
+    # Files written before snippets were kept have no Snippet column, rows appended to them keep the old layout
+    with span('write', rows=len(results_data)):
+        append_rows(results_data, csv_filename, ['Title', 'Link', 'Snippet'])
+    RECORDS_WRITTEN.inc(len(results_data))
 
     logging.info(f"Results written to {csv_filename}")
     print(f"Results written to {csv_filename}")
@@ -207,7 +389,8 @@ def save_progress(base_url, query, query_param, total_pages, current_page, resul
         'query_param': query_param,
         'total_pages': total_pages,
         'current_page': current_page,
-        'results_data': results_data
+        'results_per_page': RESULTS_PER_PAGE,
+        'results_data': to_dicts(results_data)
     }
     with open('progress.json', 'w') as f:
         json.dump(progress, f)
@@ -222,12 +405,24 @@ def load_progress():
             progress = json.load(f)
             logging.info("Progress loaded.")
             print("Progress loaded.")
-            return progress
+            return convert_progress_pages(progress)
     except FileNotFoundError:
         logging.warning("No progress file found.")
         print("No progress file found.")
         return None
 
+def convert_progress_pages(progress):
+    # Pages are numbered from 0. Page numbers saved under another page size are mapped to the
+    # page holding the same first result, so a resumed crawl neither skips nor repeats a range.
+    saved_per_page = progress.get('results_per_page', LEGACY_RESULTS_PER_PAGE)
+    if saved_per_page != RESULTS_PER_PAGE:
+        offset = progress['current_page'] * saved_per_page
+        progress['current_page'] = offset // RESULTS_PER_PAGE
+        progress['total_pages'] = -(-progress['total_pages'] * saved_per_page // RESULTS_PER_PAGE)
+        progress['results_per_page'] = RESULTS_PER_PAGE
+        logging.info(f"Converted saved progress from {saved_per_page} to {RESULTS_PER_PAGE} results per page")
+    return progress
+
 def get_user_input():
     # Gets user input for resuming or starting a new search
     while True:
@@ -249,45 +444,221 @@ def get_page_input():
         else:
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
-def main():
-    # Main function to manage fetching search results
-    query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
-    base_url = "https://scholar.google.com/scholar"
-    query_param = 'q'
-    
-    progress = load_progress()
-    if progress and progress['query'] == query:
-        print(f"Last saved page number: {progress['current_page']}")
-        if get_user_input():
-            start_page = progress['current_page']
-            total_pages = int(input("Enter the total number of pages to crawl: ").strip())
-            results_data = progress['results_data']
-            logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
-            print(f"Resuming fetching search results for query: {query} from page {start_page}")
+def get_split_input():
+    # Asks whether to split the query into publication-year windows
+    while True:
+        split = input("Split the query by publication year to get past the result cap? (y/n): ").strip().lower()
+        if split in ['yes', 'y']:
+            return True
+        elif split in ['no', 'n']:
+            return False
         else:
-            start_page, total_pages = get_page_input()
-            results_data = []
-            logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
-            print(f"Starting to fetch search results for query: {query} from page {start_page}")
-    else:
-        print("No last saved page found. Please enter the starting page and total number of pages.")
+            print("Invalid input. Please enter 'yes' or 'no'.")
+
+def get_year_range_input():
+    # Gets the range of publication years to split the query over
+    while True:
+        year_from = input(f"Enter the first publication year (blank for {DEFAULT_FIRST_YEAR}): ").strip() or str(DEFAULT_FIRST_YEAR)
+        year_to = input(f"Enter the last publication year (blank for {datetime.now().year}): ").strip() or str(datetime.now().year)
+        if year_from.isdigit() and year_to.isdigit() and int(year_from) <= int(year_to):
+            return int(year_from), int(year_to)
+        else:
+            print("Invalid input. Please enter a valid range of years.")
+
+def fetch_search_results_by_year(base_url, query, query_param, year_from, year_to, valid_proxies=None):
+    # Splits the query into year windows under the result cap and crawls them in parallel
+    if valid_proxies is None:
+        valid_proxies = get_valid_proxies(scrape_proxies())
+
+    if not valid_proxies:
+        logging.error("No valid proxies available. Exiting.")
+        return []
+
+    def estimate_window(params):
+        try:
+            html_content = fetch_page_html(base_url, build_page_params(query, query_param, 0, params), 0, valid_proxies)
+        except (CircuitOpenError, BlockedPageError) as e:
+            logging.error(f"Could not estimate year window {params}: {e}")
+            html_content = None
+        if not html_content:
+            return None, []
+        return parse_result_count(html_content), parse_results(html_content)
+
+    def crawl_window(window, start_page, total_pages):
+        return fetch_search_results(base_url, query, query_param, total_pages, start_page, valid_proxies, window['params'])
+
+    windows = plan_year_windows(estimate_window, year_from, year_to)
+    logging.info(f"Planned {len(windows)} year windows for query: {query}")
+    print(f"Planned {len(windows)} year windows for query: {query}")
+    return crawl_windows(windows, crawl_window, results_per_page=RESULTS_PER_PAGE)
+
+def fetch_first_page_html(base_url, query, query_param, valid_proxies):
+    try:
+        return fetch_page_html(base_url, build_page_params(query, query_param, 0), 0, valid_proxies)
+    except (CircuitOpenError, BlockedPageError) as e:
+        logging.error(f"First page request skipped: {e}")
+        return None
+
+def plan_new_crawl(base_url, query, query_param, valid_proxies):
+    # Sizes a new crawl from the result count on its first page.
+    # Returns (start_page, total_pages, workers, first_page_results).
+    preflight = preflight_query(query, lambda q: fetch_first_page_html(base_url, q, query_param, valid_proxies))
+    if preflight['count'] is None:
+        print("Could not estimate the number of results. Please enter the starting page and total number of pages.")
         start_page, total_pages = get_page_input()
-        results_data = []
+        return start_page, total_pages, MAX_WORKERS, RecordBatch()
+
+    total_pages, workers = size_crawl(preflight['count'], RESULTS_PER_PAGE)
+    print(f"About {preflight['count']} results, crawling {total_pages} pages with {workers} workers.")
+    if total_pages == 0:
+        return 0, 0, 0, RecordBatch()
+    return 1, total_pages - 1, workers, parse_results(preflight['html'])
+
+def crawl_page_range(base_url, query, query_param):
+    # Crawls a flat page range, resuming from the saved progress if requested
+    valid_proxies = get_valid_proxies(scrape_proxies())
+    workers = MAX_WORKERS
+    progress = load_progress()
+    if progress and progress['query'] == query and get_resume_input(progress):
+        start_page = progress['current_page']
+        total_pages = int(input("Enter the total number of pages to crawl: ").strip())
+        results_data = RecordBatch(progress['results_data'])
+        logging.info(f"Resuming fetching search results for query: {query} from page {start_page}")
+        print(f"Resuming fetching search results for query: {query} from page {start_page}")
+    else:
+        start_page, total_pages, workers, results_data = plan_new_crawl(base_url, query, query_param, valid_proxies)
         logging.info(f"Starting to fetch search results for query: {query} from page {start_page}")
         print(f"Starting to fetch search results for query: {query} from page {start_page}")
     
-    results_data.extend(fetch_search_results(base_url, query, query_param, total_pages, start_page=start_page))
-    
-    if results_data:
-        logging.info(f"Fetched {len(results_data)} results.")
-        print(f"Fetched {len(results_data)} results.")
-    else:
-        logging.warning("No results fetched.")
-        print("No results fetched.")
+    results_data.extend(fetch_search_results(base_url, query, query_param, total_pages, start_page, valid_proxies, workers=workers))
+    return results_data
+
+def get_resume_input(progress):
+    print(f"Last saved page number: {progress['current_page']}")
+    return get_user_input()
+
+def run_scheduled(base_url, queries, query_param, time_budget=None):
+    # Non-interactive crawl for the scheduler: sizes every query first, then shares
+    # proxies and time between them in proportion to their size
+    valid_proxies = get_valid_proxies(scrape_proxies())
+    if not valid_proxies:
+        logging.error("No valid proxies available. Exiting.")
+        return []
+
+    preflights = [preflight_query(q, lambda q: fetch_first_page_html(base_url, q, query_param, valid_proxies)) for q in queries]
+    results_data = RecordBatch()
+    for plan in allocate_budget(preflights, valid_proxies, time_budget, RESULTS_PER_PAGE):
+        start_page = 0
+        if plan['html']:
+            results_data.extend(parse_results(plan['html']))
+            start_page = 1
+        logging.info(f"Scheduled crawl of {plan['total_pages']} pages for query: {plan['query']}")
+        results_data.extend(fetch_search_results(base_url, plan['query'], query_param, plan['total_pages'] - start_page, start_page,
+                                                 plan['proxies'], workers=plan['workers']))
+    return results_data
+
+def crawl_incremental(base_url, queries, query_param, known, valid_proxies=None):
+    # Crawls only what is new since the last run: pages through the results newest first
+    # and stops at a run of publications that are already known (a KnownPublications)
+    if valid_proxies is None:
+        valid_proxies = get_valid_proxies(scrape_proxies())
+    if not valid_proxies:
+        logging.error("No valid proxies available. Exiting.")
+        return RecordBatch()
+
+    sort_params = date_sort_params(base_url)
+    results_data = RecordBatch()
+    for query in queries:
+        detector = KnownRunDetector(known)
+        new_before = len(results_data)
+        logging.info(f"Starting to fetch search results for query: {query} from page 0, newest first")
+        pages = 0
+        for page in range(INCREMENTAL_MAX_PAGES):
+            try:
+                page_results = fetch_page_results(base_url, query, query_param, page, valid_proxies, sort_params)
+            except (CircuitOpenError, BlockedPageError) as e:
+                logging.error(f"Incremental crawl of query {query} stopped at page {page}: {e}")
+                break
+            if page_results is None:
+                # Not the end of the results, so older new publications past this page may be missed
+                logging.error(f"Incremental crawl of query {query} stopped at page {page}: the page could not be fetched")
+                break
+            pages += 1
+            results_data.extend(detector.new_results(page_results))
+            if detector.done or not page_results:
+                break
+        message = f"Incremental crawl of query {query}: {len(results_data) - new_before} new results from {pages} pages"
+        logging.info(message)
+        print(message)
+    return results_data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl search results for the NYU HPC acknowledgment")
+    parser.add_argument('--query', action='append', dest='queries', metavar='QUERY',
+                        help="Query to crawl, repeat it to crawl several (default: the NYU HPC acknowledgment)")
+    parser.add_argument('--scheduled', action='store_true', help="Run without prompts, sizing the crawl from a preflight request")
+    parser.add_argument('--time-budget', type=float, default=None, help="Minutes to spread across the queries of a scheduled run")
+    parser.add_argument('--metrics-port', type=int, nargs='?', const=DEFAULT_METRICS_PORT, default=None,
+                        help=f"Serve Prometheus metrics on this local port while crawling (default {DEFAULT_METRICS_PORT})")
+    parser.add_argument('--profile', action='store_true', help="Profile the run, writing collapsed stacks and an allocation report to logs/")
+    parser.add_argument('--trace', action='store_true', help="Write per-page tracing spans to a Chrome trace file in logs/")
+    parser.add_argument('--hedge', action='store_true', help="Duplicate page requests slower than the host's p90 latency through a second proxy")
+    parser.add_argument('--incremental', action='store_true', help="Only fetch results newer than the publications already saved, newest first")
+    return parser.parse_args()
+
+def run_crawl(args, base_url, queries, query_param, known):
+    # Runs the crawl mode selected on the command line or at the prompts
+    if args.incremental:
+        return crawl_incremental(base_url, queries, query_param, known)
+    if args.scheduled:
+        time_budget = args.time_budget * 60 if args.time_budget else None
+        return run_scheduled(base_url, queries, query_param, time_budget)
+    results_data = RecordBatch()
+    for query in queries:
+        if get_split_input():
+            year_from, year_to = get_year_range_input()
+            logging.info(f"Starting to fetch search results for query: {query} split over years {year_from}-{year_to}")
+            results_data.extend(fetch_search_results_by_year(base_url, query, query_param, year_from, year_to))
+        else:
+            results_data.extend(crawl_page_range(base_url, query, query_param))
+    return results_data
+
+def main():
+    # Main function to manage fetching search results
+    global hedge_policy
+    setup_logging('logs')
+    os.makedirs('results', exist_ok=True)
+    base_url = "https://scholar.google.com/scholar"
+    query_param = 'q'
+    args = parse_args()
+    queries = args.queries or [DEFAULT_QUERY]
+    RETRY_POLICY.on_exhausted = lambda error_class: RETRY_BUDGET_EXHAUSTED.labels(error=error_class).inc()
+    if args.hedge:
+        hedge_policy = HedgePolicy(on_outcome=lambda outcome: HEDGES.labels(outcome=outcome).inc())
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
     
-    write_to_csv(results_data)
-    logging.info("Results written to CSV")
-    print("Results written to CSV")
+    try:
+        with profile_run(args.profile, sys.modules[__name__], 'logs', 'google_scholar_new'), tracing_run(args.trace):
+            known = KnownPublications()
+            results_data = run_crawl(args, base_url, queries, query_param, known)
+            
+            if results_data:
+                logging.info(f"Fetched {len(results_data)} results.")
+                print(f"Fetched {len(results_data)} results.")
+            else:
+                logging.warning("No results fetched.")
+                print("No results fetched.")
+            
+            write_to_csv(results_data)
+            logging.info("Results written to CSV")
+            print("Results written to CSV")
+            # Every mode records what it saved, or the next incremental run would not stop at
+            # publications a full crawl found and would write them again. Only once they are
+            # saved, so a failed write leaves them to be found again.
+            known.add_all(results_data)
+    finally:
+        dump_metrics(f"logs/{datetime.now().strftime('%Y-%m-%d')}_metrics.prom")
 
 if __name__ == "__main__":
     main()
@@ -1,83 +1,295 @@
 import logging
 from tqdm import tqdm
-from scholarly import scholarly, ProxyGenerator
 import os
+import sys
 import csv
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from crawl_profiler import profile_run
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+OUTPUT_FILE = 'faculty_pubs.csv'
+AUTHORS_FILE = 'faculty_authors.txt'  # One faculty name per line
+DEFAULT_AUTHOR_NAMES = ['Albert Einstein']
+FILL_WORKERS = 8
 
-# Activate proxy because Google Scholar might otherwise block the IP address
-logging.debug("Setting up proxy...")
-pg = ProxyGenerator()
-scholarly.use_proxy(pg, pg)
+# Citation refresh state: last seen count and fill schedule per publication
+STATE_FILE = 'citation_state.json'
+DAY = 24 * 60 * 60
+MIN_REFRESH_INTERVAL = 7 * DAY
+MAX_REFRESH_INTERVAL = 180 * DAY
+CITES_PER_REFRESH = 5  # Aim to refill a publication once it has gained about this many citations
 
-author_names = ['Albert Einstein']
+CITE_YEARS = range(2022, 2023)
 
 keys = ['author', 'title', 'num_citations', 'number_of_co_authors', 'pub_year']
-for year in range(2022, 2023):
+for year in CITE_YEARS:
     keys.append(f'{year}')
 
-logging.debug("Opening output file...")
-output_file = open('faculty_pubs.csv', 'a', newline='', encoding='utf-8', errors='replace')
-dict_writer = csv.DictWriter(output_file, keys)
+def setup_proxy():
+    # Activate proxy because Google Scholar might otherwise block the IP address
+    from scholarly import scholarly, ProxyGenerator
+    logging.debug("Setting up proxy...")
+    pg = ProxyGenerator()
+    scholarly.use_proxy(pg, pg)
 
-if os.path.getsize('faculty_pubs.csv') == 0:
-    dict_writer.writeheader()
-    output_file.flush()
+def load_author_names(authors_file=AUTHORS_FILE):
+    # Reads the faculty list, skipping blank lines and comments
+    if not os.path.exists(authors_file):
+        logging.warning(f"No authors file {authors_file} found, using the default author list.")
+        return DEFAULT_AUTHOR_NAMES
+    with open(authors_file, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
-dict_reader = csv.DictReader(open('faculty_pubs.csv', newline='', encoding='utf-8', errors='replace'), keys)
-csv_reader = [row for row in dict_reader]
+def pub_key(author, title):
+    # Hash index key for a publication, compact enough to hold every harvested row in memory
+    return hashlib.blake2b(f"{author.strip().lower()}\t{title.strip().lower()}".encode('utf-8'), digest_size=16).digest()
 
-for name in author_names:
+def load_harvested_keys(output_file=OUTPUT_FILE):
+    # Streams the output file once and returns the keys of the publications already in it
+    harvested = set()
+    if os.path.exists(output_file):
+        with open(output_file, newline='', encoding='utf-8', errors='replace') as f:
+            for row in csv.DictReader(f):
+                if row.get('author') and row.get('title'):
+                    harvested.add(pub_key(row['author'], row['title']))
+    logging.info(f"Found {len(harvested)} publications already harvested in {output_file}")
+    return harvested
+
+def fetch_author_publications(name):
+    # Returns the publication listing of the best matching author profile
+    from scholarly import scholarly
     logging.debug(f"Searching for author: {name}")
     try:
         author = next(scholarly.search_author(name))
-        author = scholarly.fill((author), sections=['publications'])
     except StopIteration:
         logging.error(f"No author found for name: {name}")
-        continue
-
+        return []
+    author = scholarly.fill(author, sections=['publications'])
     pubs = author['publications']
     logging.info(f"Found {len(pubs)} publications for {name}")
+    return pubs
 
-    progress_bar = tqdm(total=len(pubs), desc=f"Processing publications for {name}")
-    author_pubs_in_file = [row for row in csv_reader if row['author'] == name]
-    num_author_pubs_in_file = len(author_pubs_in_file)
+def build_pub_row(name, pub):
+    # Converts a filled publication to a faculty_pubs.csv row
+    pub_res = {
+        "author": name,
+        "title": pub['bib']['title'],
+        "num_citations": pub['num_citations'],
+    }
 
-    for i, pub in enumerate(pubs):
-        if i < num_author_pubs_in_file:
-            progress_bar.update(1)
-            continue
+    if 'author' in pub['bib']:
+        pub_res["number_of_co_authors"] = len(pub['bib']['author'].split(' and ')) - 1
+    else:
+        pub_res["number_of_co_authors"] = ''
 
-        pub = scholarly.fill(pub)
-        if any(x['title'] == pub['bib']['title'] for x in author_pubs_in_file):
-            progress_bar.update(1)
-            continue
+    if 'pub_year' in pub['bib']:
+        pub_res['pub_year'] = pub['bib']['pub_year']
+    else:
+        pub_res['pub_year'] = ''
 
-        pub_res = {
-            "author": name,
-            "title": pub['bib']['title'],
-            "num_citations": pub['num_citations'],
-        }
+    for year in CITE_YEARS:
+        pub_res[f'{year}'] = pub['cites_per_year'].get(year, '')
 
-        if 'author' in pub['bib']:
-            pub_res["number_of_co_authors"] = len(pub['bib']['author'].split(' and ')) - 1
-        else:
-            pub_res["number_of_co_authors"] = ''
+    return pub_res
 
-        if 'pub_year' in pub['bib']:
-            pub_res['pub_year'] = pub['bib']['pub_year']
-        else:
-            pub_res['pub_year'] = ''
+def fill_publication(name, pub):
+    from scholarly import scholarly
+    return build_pub_row(name, scholarly.fill(pub))
+
+def harvest_publications(author_names, output_file=OUTPUT_FILE, workers=FILL_WORKERS):
+    # Fills the publications of every author on a worker pool, skipping the ones already harvested
+    harvested = load_harvested_keys(output_file)
+
+    logging.debug("Opening output file...")
+    with open(output_file, 'a', newline='', encoding='utf-8', errors='replace') as f:
+        dict_writer = csv.DictWriter(f, keys)
+        if f.tell() == 0:
+            dict_writer.writeheader()
+            f.flush()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            listing_futures = {executor.submit(fetch_author_publications, name): name for name in author_names}
+            fill_futures = {}
+            progress_bar = tqdm(total=0, desc="Processing publications")
+
+            for future in as_completed(listing_futures):
+                name = listing_futures[future]
+                try:
+                    pubs = future.result()
+                except Exception as e:
+                    logging.error(f"Fetching publications for {name} failed: {e}")
+                    continue
+
+                progress_bar.total += len(pubs)
+                progress_bar.refresh()
+                for pub in pubs:
+                    key = pub_key(name, pub['bib']['title'])
+                    if key in harvested:
+                        progress_bar.update(1)
+                        continue
+                    harvested.add(key)
+                    fill_futures[executor.submit(fill_publication, name, pub)] = name
+
+            for future in as_completed(fill_futures):
+                try:
+                    dict_writer.writerow(future.result())
+                    f.flush()
+                except Exception as e:
+                    logging.error(f"Filling a publication for {fill_futures[future]} failed: {e}")
+                progress_bar.update(1)
+
+            progress_bar.close()
+
+def load_citation_state(state_file=STATE_FILE):
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_citation_state(state, state_file=STATE_FILE):
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def seed_citation_state(state, output_file, now):
+    # Starts tracking rows harvested before the refresh state existed, due immediately
+    if not os.path.exists(output_file):
+        return
+    with open(output_file, newline='', encoding='utf-8', errors='replace') as f:
+        for row in csv.DictReader(f):
+            if not row.get('author') or not row.get('title'):
+                continue
+            key = pub_key(row['author'], row['title']).hex()
+            if key not in state:
+                num_citations = int(row['num_citations']) if str(row.get('num_citations', '')).isdigit() else 0
+                state[key] = {
+                    'num_citations': num_citations,
+                    'filled_citations': num_citations,
+                    'last_seen': now,
+                    'last_filled': now,
+                    'interval': MIN_REFRESH_INTERVAL,
+                    'next_due': now
+                }
+
+def next_refresh_interval(entry, num_citations, now):
+    # Schedules papers that gain citations quickly more often than dormant ones
+    elapsed = max(now - entry['last_filled'], DAY)
+    gained = num_citations - entry['filled_citations']
+    if gained <= 0:
+        interval = entry.get('interval', MIN_REFRESH_INTERVAL) * 2
+    else:
+        interval = CITES_PER_REFRESH * elapsed / gained
+    return min(max(interval, MIN_REFRESH_INTERVAL), MAX_REFRESH_INTERVAL)
+
+def rewrite_output_file(updated_rows, output_file=OUTPUT_FILE):
+    # Replaces refreshed rows in place and appends rows for new publications
+    pending = dict(updated_rows)
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8', errors='replace') as out:
+        dict_writer = csv.DictWriter(out, keys)
+        dict_writer.writeheader()
+        if os.path.exists(output_file):
+            with open(output_file, newline='', encoding='utf-8', errors='replace') as f:
+                for row in csv.DictReader(f):
+                    key = pub_key(row['author'], row['title']).hex()
+                    row = {**row, **pending.pop(key, {})}
+                    dict_writer.writerow({k: row.get(k, '') for k in keys})
+        for row in pending.values():
+            dict_writer.writerow({k: row.get(k, '') for k in keys})
+    os.replace(tmp_file, output_file)
+
+def refresh_citations(author_names, output_file=OUTPUT_FILE, state_file=STATE_FILE, workers=FILL_WORKERS):
+    # Updates citation counts from the cheap author listings and only fills
+    # the publications whose count changed and whose refresh is due
+    state = load_citation_state(state_file)
+    now = time.time()
+    seed_citation_state(state, output_file, now)
+    updated_rows = {}
+    to_fill = []
 
-        for year in range(2022, 2023):
-            pub_res[f'{year}'] = pub['cites_per_year'].get(year, '')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        listing_futures = {executor.submit(fetch_author_publications, name): name for name in author_names}
+        for future in tqdm(as_completed(listing_futures), total=len(listing_futures), desc="Fetching author listings"):
+            name = listing_futures[future]
+            try:
+                pubs = future.result()
+            except Exception as e:
+                logging.error(f"Fetching publications for {name} failed: {e}")
+                continue
 
-        dict_writer.writerow(pub_res)
-        output_file.flush()
-        progress_bar.update(1)
+            for pub in pubs:
+                title = pub['bib']['title']
+                num_citations = pub.get('num_citations', 0)
+                key = pub_key(name, title).hex()
+                entry = state.get(key)
+                if entry is None:
+                    to_fill.append((key, name, pub))
+                    continue
 
-    progress_bar.close()
+                entry['num_citations'] = num_citations
+                entry['last_seen'] = now
+                if num_citations != entry['filled_citations']:
+                    updated_rows[key] = {'author': name, 'title': title, 'num_citations': num_citations}
+                if now >= entry['next_due']:
+                    if num_citations != entry['filled_citations']:
+                        to_fill.append((key, name, pub))
+                    else:
+                        entry['interval'] = next_refresh_interval(entry, num_citations, now)
+                        entry['next_due'] = now + entry['interval']
+
+        logging.info(f"Filling {len(to_fill)} new or changed publications")
+        fill_futures = {executor.submit(fill_publication, name, pub): (key, name) for key, name, pub in to_fill}
+        for future in tqdm(as_completed(fill_futures), total=len(fill_futures), desc="Refreshing publications"):
+            key, name = fill_futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                logging.error(f"Filling a publication for {name} failed: {e}")
+                continue
+
+            updated_rows[key] = row
+            entry = state.get(key)
+            if entry is None:
+                entry = state[key] = {'filled_citations': row['num_citations'], 'last_filled': now, 'interval': MIN_REFRESH_INTERVAL}
+            else:
+                entry['interval'] = next_refresh_interval(entry, row['num_citations'], now)
+            entry.update({
+                'num_citations': row['num_citations'],
+                'filled_citations': row['num_citations'],
+                'last_seen': now,
+                'last_filled': now,
+                'next_due': now + entry['interval']
+            })
+
+    rewrite_output_file(updated_rows, output_file)
+    save_citation_state(state, state_file)
+    logging.info(f"Refreshed {len(updated_rows)} rows, filled {len(fill_futures)} publications")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Harvest faculty publications from Google Scholar")
+    parser.add_argument('--refresh', action='store_true', help="Refresh citation counts of already harvested publications")
+    parser.add_argument('--authors-file', default=AUTHORS_FILE, help="File with one faculty name per line")
+    parser.add_argument('--workers', type=int, default=FILL_WORKERS, help="Number of concurrent Scholar requests")
+    parser.add_argument('--profile', action='store_true', help="Profile the run, writing collapsed stacks and an allocation report to logs/")
+    return parser.parse_args()
+
+def main():
+    # Set up logging
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    with profile_run(args.profile, sys.modules[__name__], 'logs', 'google_scholar_test'):
+        setup_proxy()
+        author_names = load_author_names(args.authors_file)
+        if args.refresh:
+            refresh_citations(author_names, workers=args.workers)
+        else:
+            harvest_publications(author_names, workers=args.workers)
+    logging.info("Processing completed.")
 
-logging.info("Processing completed.")
+if __name__ == "__main__":
+    main()
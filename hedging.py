@@ -0,0 +1,139 @@
+import time
+import logging
+import threading
+import contextvars
+from contextlib import nullcontext
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+HEDGE_QUANTILE = 0.9  # Hedge once a request is slower than this share of recent requests to the host
+MIN_SAMPLES = 20  # No hedging until a host has this many latency samples
+LATENCY_WINDOW = 200  # Recent latencies kept per host
+# Each primary request earns HEDGE_BUDGET_RATIO of a hedge, capped at HEDGE_BUDGET_BURST saved up,
+# so hedges add at most about 10% extra requests however slow the proxies get
+HEDGE_BUDGET_RATIO = 0.1
+HEDGE_BUDGET_BURST = 5
+HEDGE_WORKERS = 16
+
+class HedgePolicy:
+    # Sends a duplicate request through another proxy once the first one has taken longer
+    # than the host's observed p90, and returns whichever response arrives first
+
+    def __init__(self, quantile=HEDGE_QUANTILE, budget_ratio=HEDGE_BUDGET_RATIO, budget_burst=HEDGE_BUDGET_BURST,
+                 min_samples=MIN_SAMPLES, workers=HEDGE_WORKERS, on_outcome=None):
+        self.quantile = quantile
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.min_samples = min_samples
+        self.on_outcome = on_outcome
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._tokens = budget_burst
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedge')
+
+    def record_latency(self, host, seconds):
+        with self._lock:
+            self._latencies[host].append(seconds)
+
+    def hedge_delay(self, host):
+        # Observed latency quantile for the host, None until there are enough samples
+        with self._lock:
+            samples = sorted(self._latencies[host])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.quantile))]
+
+    def _earn(self):
+        with self._lock:
+            self._tokens = min(self.budget_burst, self._tokens + self.budget_ratio)
+
+    def _has_budget(self):
+        with self._lock:
+            return self._tokens >= 1
+
+    def _spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _outcome(self, outcome):
+        if self.on_outcome:
+            self.on_outcome(outcome)
+
+    def _timed_send(self, host, send, proxy):
+        # Failures and timeouts count towards the host's latency too, they are what hedging is for.
+        # Returns (response, proxy).
+        start = time.perf_counter()
+        try:
+            return send(proxy), proxy
+        finally:
+            self.record_latency(host, time.perf_counter() - start)
+
+    def _submit(self, fn, *args):
+        # Runs fn on the hedge pool in a copy of the caller's context, so tracing spans nest
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def _hedge_after(self, delay, host, send, primary_proxy, pick_alternate, record_hedge, primary_done):
+        # Runs on the pool. Waits out the hedge delay, then sends through an alternate proxy while
+        # holding that proxy's permit. Returns (response, proxy), or None when no hedge was sent.
+        if primary_done.wait(delay):
+            return None
+        if not self._has_budget():
+            self._outcome('budget_exhausted')
+            return None
+        picked = pick_alternate(primary_proxy)
+        if picked is None:
+            return None
+        alternate_proxy, permit = picked
+        with permit or nullcontext():
+            if primary_done.is_set():
+                return None
+            if not self._spend():
+                self._outcome('budget_exhausted')
+                return None
+            logging.info(f"Hedging request to {host} through {alternate_proxy} after {delay:.1f}s on {primary_proxy}")
+            self._outcome('sent')
+            # The hedge may lose the race and be ignored, so it settles its proxy's outcome itself
+            try:
+                response, _ = self._timed_send(host, send, alternate_proxy)
+            except Exception as e:
+                if record_hedge:
+                    record_hedge(alternate_proxy, None, e)
+                raise
+            if record_hedge:
+                record_hedge(alternate_proxy, response, None)
+            return response, alternate_proxy
+
+    def fetch(self, host, send, primary_proxy, pick_alternate, record_hedge=None):
+        # send(proxy) makes the request and returns the response. pick_alternate(used_proxy) returns
+        # (proxy, permit) for another healthy proxy, or None; the permit, a context manager or None,
+        # is held by the hedge until its request is over. record_hedge(proxy, response, error) is
+        # called with the hedge's outcome. Returns (response, proxy that served it); when every
+        # request fails, the first request's error is raised.
+        self._earn()
+        delay = self.hedge_delay(host)
+        if delay is None:
+            return self._timed_send(host, send, primary_proxy)
+
+        primary_done = threading.Event()
+        primary = self._submit(self._timed_send, host, send, primary_proxy)
+        hedge = self._submit(self._hedge_after, delay, host, send, primary_proxy, pick_alternate, record_hedge, primary_done)
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if primary in done:
+                    primary_done.set()
+                # The primary's response wins a tie
+                for future in sorted(done, key=lambda future: future is not primary):
+                    if future.exception() is not None or future.result() is None:
+                        continue
+                    # The other request runs to its timeout in the background and is ignored
+                    if future is hedge:
+                        self._outcome('won')
+                    return future.result()
+            return primary.result()
+        finally:
+            primary_done.set()
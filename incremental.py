@@ -0,0 +1,100 @@
+import os
+import csv
+import glob
+import logging
+from urllib.parse import urlsplit
+from near_dedup import normalize_title
+from page_fingerprint import normalize_link
+
+KNOWN_KEYS_FILE = 'results/known_publications.txt'
+SEED_CSV_PATTERN = 'results/*.csv'
+# Consecutive already-known results, newest first, after which the rest is assumed known too
+KNOWN_RUN_TO_STOP = 10
+# Pages a run may touch before giving up on finding the known run, Scholar's cap of 1000 results
+INCREMENTAL_MAX_PAGES = 50
+
+# Query parameters that sort results newest first, by host
+DATE_SORT_PARAMS = {
+    'scholar.google.com': {'scisbd': 1},
+    'www.google.com': {'tbs': 'sbd:1'},
+}
+
+def date_sort_params(base_url):
+    return DATE_SORT_PARAMS.get(urlsplit(base_url).netloc, {})
+
+def publication_key(record):
+    # The normalized link identifies a publication, the normalized title stands in when there is none
+    link = record.get('Link') or ''
+    if link and link != "Link not found":
+        return normalize_link(link)
+    title = normalize_title(record.get('Title') or '')
+    return f"title:{title}" if title else None
+
+class KnownPublications:
+    # Keys of every publication already saved, kept one per line in an append-only file.
+    # Without the file it is seeded from the results CSVs, so the first incremental run
+    # does not crawl everything again.
+
+    def __init__(self, path=KNOWN_KEYS_FILE, seed_pattern=SEED_CSV_PATTERN):
+        self.path = path
+        self.keys = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.keys.update(line.rstrip('\n') for line in f if line.strip())
+        else:
+            self.add_all(self._seed_rows(seed_pattern))
+        logging.info(f"Loaded {len(self.keys)} known publication keys")
+
+    @staticmethod
+    def _seed_rows(pattern):
+        for csv_filename in sorted(glob.glob(pattern)):
+            with open(csv_filename, mode='r', newline='', encoding='utf-8') as file:
+                yield from csv.DictReader(file)
+
+    def __contains__(self, record):
+        return publication_key(record) in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add_all(self, records):
+        # Adds the records' keys and appends the new ones to the file, returns how many were new
+        new_keys = []
+        for record in records:
+            key = publication_key(record)
+            if key and key not in self.keys:
+                self.keys.add(key)
+                new_keys.append(key)
+        if new_keys:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(key + '\n' for key in new_keys)
+        return len(new_keys)
+
+class KnownRunDetector:
+    # Follows date-sorted results page by page and tells when enough consecutive
+    # results were already known to stop paging
+
+    def __init__(self, known, run_to_stop=KNOWN_RUN_TO_STOP):
+        self.known = known
+        self.run_to_stop = run_to_stop
+        self.known_run = 0
+
+    @property
+    def done(self):
+        return self.known_run >= self.run_to_stop
+
+    def new_results(self, page_results):
+        # Returns the page's results that are not known yet, in page order
+        new = []
+        for record in page_results:
+            if record in self.known:
+                self.known_run += 1
+                if self.done:
+                    break
+            else:
+                self.known_run = 0
+                new.append(record)
+        return new
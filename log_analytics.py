@@ -0,0 +1,200 @@
+import os
+import re
+import bz2
+import sys
+import glob
+import gzip
+import json
+import lzma
+import argparse
+from collections import Counter
+from datetime import datetime
+from statistics import median
+
+# Plain-text lines as written by the crawlers' LOG_FORMAT, continuation lines of tracebacks don't match
+PLAIN_LINE_RE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)[,.](\d{3}) - ([A-Z]+) - (.*)')
+
+# One alternation tried once per message, the matching group names the event
+EVENT_RE = re.compile(
+    r'(?P<run_start>^(?:Starting to fetch|Resuming fetching) search results)'
+    r'|(?:Connection refused|Proxy error|General error) for proxy (?P<proxy_failure>[\w.\-]+:\d+)'
+    r'|^Removed invalid proxy: (?P<proxy_removed>\S+)'
+    r'|^Request failed (?:for page \d+ )?\(retries left: (?P<retry>\d+)\)'
+    r'|^Fetched HTML content for page (?P<page_fetched>\d+)'
+    r'|(?P<throttled>^Too many requests)'
+    r'|^Page (?P<blocked>\d+) blocked through'
+    r'|^Stopped pagination for query .* saved (?P<pagination_stopped>\d+) page requests'
+)
+COMPRESSED_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+DEFAULT_LOG_PATTERNS = ['*.log', 'logs/*.log', 'logs/*.log.gz', 'logs/*.log.bz2', 'logs/*.log.xz']
+
+def open_log(path):
+    # Opens a plain or compressed log for streaming, decoding lazily line by line
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+def parse_line(line):
+    # Returns (timestamp, level, message, suppressed) for a plain-text or JSON log line, None for anything else.
+    # suppressed is the number of events of the same type the sampler dropped before this one.
+    if line.startswith('{'):
+        try:
+            event = json.loads(line)
+            return datetime.fromisoformat(event['ts']), event.get('level', ''), event.get('msg', ''), int(event.get('suppressed', 0))
+        except (ValueError, KeyError, TypeError):
+            return None
+    match = PLAIN_LINE_RE.match(line)
+    if not match:
+        return None
+    timestamp = datetime.fromisoformat(f"{match.group(1)}.{match.group(2)}")
+    return timestamp, match.group(3), match.group(4), 0
+
+class Run:
+    # One crawl, from its "Starting to fetch" line to the next one
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.first_success = None
+        self.pages = 0
+        self.proxy_failures = 0
+
+    @property
+    def minutes(self):
+        return (self.end - self.start).total_seconds() / 60
+
+class LogStats:
+    def __init__(self):
+        self.lines = 0
+        self.events = Counter()
+        self.levels = Counter()
+        self.proxy_failures = Counter()
+        self.removed_proxies = set()
+        self.retries_left = Counter()
+        self.requests_saved = 0
+        self.runs = []
+
+    def _current_run(self, timestamp):
+        if not self.runs:
+            self.runs.append(Run(timestamp))
+        return self.runs[-1]
+
+    def add(self, timestamp, level, message, suppressed=0):
+        # A sampled line stands for itself and the events suppressed before it, which had the same
+        # event type and are counted as if they matched the same way
+        count = 1 + suppressed
+        self.lines += 1
+        self.levels[level] += count
+        match = EVENT_RE.search(message)
+        if match is None:
+            if self.runs:
+                self.runs[-1].end = max(self.runs[-1].end, timestamp)
+            return
+        kind = match.lastgroup
+        self.events[kind] += count
+        if kind == 'run_start':
+            self.runs.append(Run(timestamp))
+            return
+        run = self._current_run(timestamp)
+        run.end = max(run.end, timestamp)
+        if kind == 'proxy_failure':
+            self.proxy_failures[match.group(kind)] += count
+            run.proxy_failures += count
+        elif kind == 'proxy_removed':
+            self.removed_proxies.add(match.group(kind))
+        elif kind == 'pagination_stopped':
+            self.requests_saved += int(match.group(kind))
+        elif kind == 'retry':
+            self.retries_left[int(match.group(kind))] += count
+        elif kind == 'page_fetched':
+            run.pages += count
+            if run.first_success is None:
+                run.first_success = timestamp
+
+    def consume(self, path):
+        with open_log(path) as f:
+            for line in f:
+                parsed = parse_line(line)
+                if parsed:
+                    self.add(*parsed)
+
+    def summary(self, top=10):
+        # Proxy failures are mostly proxy validation, failed page requests are the retry lines
+        page_requests = self.events['retry'] + self.events['page_fetched']
+        first_success = [(r.first_success - r.start).total_seconds() for r in self.runs if r.first_success]
+        minutes = sum(r.minutes for r in self.runs)
+        return {
+            'lines': self.lines,
+            'levels': dict(self.levels),
+            'runs': len(self.runs),
+            'pages_fetched': self.events['page_fetched'],
+            'pages_per_minute': round(self.events['page_fetched'] / minutes, 2) if minutes else None,
+            'page_fetch_failures': self.events['retry'],
+            'page_fetch_failure_rate': round(self.events['retry'] / page_requests, 4) if page_requests else None,
+            'proxy_failures': self.events['proxy_failure'],
+            'distinct_failing_proxies': len(self.proxy_failures),
+            'proxies_removed': len(self.removed_proxies),
+            'throttled_429': self.events['throttled'],
+            'pages_blocked': self.events['blocked'],
+            'pagination_stops': self.events['pagination_stopped'],
+            'requests_saved_by_pagination_stops': self.requests_saved,
+            'retries_by_retries_left': dict(sorted(self.retries_left.items(), reverse=True)),
+            'seconds_to_first_success': {
+                'runs_with_success': len(first_success),
+                'median': round(median(first_success), 1) if first_success else None,
+                'max': round(max(first_success), 1) if first_success else None,
+            },
+            'top_failing_proxies': self.proxy_failures.most_common(top),
+            'per_run': [{
+                'start': r.start.isoformat(sep=' ', timespec='seconds'),
+                'minutes': round(r.minutes, 1),
+                'pages': r.pages,
+                'proxy_failures': r.proxy_failures,
+                'seconds_to_first_success': round((r.first_success - r.start).total_seconds(), 1) if r.first_success else None,
+            } for r in self.runs],
+        }
+
+def print_summary(summary):
+    print(f"{summary['lines']} log lines, {summary['runs']} runs")
+    print(f"Pages fetched: {summary['pages_fetched']} ({summary['pages_per_minute']} per minute of crawl time), "
+          f"{summary['page_fetch_failures']} failed page requests, failure rate {summary['page_fetch_failure_rate']}")
+    print(f"Proxy failures: {summary['proxy_failures']} from {summary['distinct_failing_proxies']} proxies, "
+          f"{summary['proxies_removed']} proxies removed")
+    print(f"429 responses: {summary['throttled_429']}, block pages: {summary['pages_blocked']}")
+    print(f"Pagination stopped on a repeated page {summary['pagination_stops']} times, "
+          f"saving {summary['requests_saved_by_pagination_stops']} page requests")
+    print(f"Retries by retries left: {summary['retries_by_retries_left']}")
+    first_success = summary['seconds_to_first_success']
+    print(f"Seconds to first success: median {first_success['median']}, max {first_success['max']} "
+          f"({first_success['runs_with_success']} runs with a success)")
+    print("Top failing proxies:")
+    for proxy, count in summary['top_failing_proxies']:
+        print(f"  {proxy:<24}{count:>8}")
+    print("Runs:")
+    for run in summary['per_run']:
+        print(f"  {run['start']}  {run['minutes']:>7} min  {run['pages']:>5} pages  {run['proxy_failures']:>6} proxy failures"
+              f"  first success after {run['seconds_to_first_success']} s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Aggregate proxy failures, retries and throughput from crawler logs")
+    parser.add_argument('logs', nargs='*', help="Log files, plain or .gz/.bz2/.xz (default: *.log and logs/*.log*)")
+    parser.add_argument('--top', type=int, default=10, help="Number of failing proxies to list")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    paths = args.logs or sorted({path for pattern in DEFAULT_LOG_PATTERNS for path in glob.glob(pattern)})
+    if not paths:
+        print("No log files found.")
+        sys.exit(1)
+
+    stats = LogStats()
+    for path in paths:
+        stats.consume(path)
+    summary = stats.summary(args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+import re
+import csv
+import random
+import logging
+import hashlib
+import unicodedata
+
+# MinHash/LSH parameters: 16 bands of 4 rows put the LSH threshold near a
+# Jaccard similarity of 0.5, the verification step below then applies the
+# stricter SIMILARITY_THRESHOLD to the candidates that share a bucket.
+NUM_PERM = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.8
+
+# Truncated titles ("... and High ...") are matched by prefix rather than by
+# shingle overlap, as long as enough of the title survived the truncation.
+PREFIX_LENGTH = 30
+
+# Parser placeholders for a missing title, never matched against each other
+PLACEHOLDER_TITLES = frozenset(['title not found'])
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1105)
+_PERMUTATIONS = [(_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1)) for _ in range(NUM_PERM)]
+
+_ELLIPSIS_RE = re.compile(r'(\.\.\.|…)\s*$')
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+def is_truncated(title):
+    # Scholar and Google cut long titles with a trailing "..."
+    return bool(_ELLIPSIS_RE.search(title or ''))
+
+def normalize_title(title):
+    # Lowercases, strips accents, punctuation and the truncation marker
+    title = _ELLIPSIS_RE.sub('', title or '')
+    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii')
+    return _NON_WORD_RE.sub(' ', title.lower()).strip()
+
+def _match_title(title):
+    # Normalized title to index and match on, empty for a missing or placeholder title
+    normalized = normalize_title(title)
+    return '' if normalized in PLACEHOLDER_TITLES else normalized
+
+def title_shingles(normalized_title):
+    # Character shingles of the normalized title, as 32-bit hashes
+    text = normalized_title.replace(' ', '_')
+    if len(text) <= SHINGLE_SIZE:
+        text_shingles = {text} if text else set()
+    else:
+        text_shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return {int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'big') for s in text_shingles}
+
+def minhash_signature(shingles):
+    # Computes the MinHash signature of a set of shingle hashes
+    if not shingles:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles) for a, b in _PERMUTATIONS)
+
+def signature_similarity(sig_a, sig_b):
+    # Estimates the Jaccard similarity of two titles from their signatures
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+def _band_keys(signature):
+    for band in range(NUM_BANDS):
+        start = band * ROWS_PER_BAND
+        yield (band, hash(signature[start:start + ROWS_PER_BAND]))
+
+class NearDuplicateIndex:
+    # Index of publication records that finds near-duplicate titles through
+    # LSH buckets, so each lookup only compares against a handful of
+    # candidates instead of every record seen so far.
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.records = []
+        self._titles = []
+        self._signatures = []
+        self._exact = {}
+        self._buckets = {}
+        self._prefixes = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def find(self, title):
+        # Returns the id of an indexed record matching the title, or None
+        normalized = _match_title(title)
+        if not normalized:
+            return None
+        return self._find(normalized, is_truncated(title), None)
+
+    def _find(self, normalized, truncated, signature):
+        if normalized in self._exact:
+            return self._exact[normalized]
+
+        if truncated and len(normalized) >= PREFIX_LENGTH:
+            for record_id in self._prefixes.get(normalized[:PREFIX_LENGTH], ()):
+                if self._titles[record_id].startswith(normalized):
+                    return record_id
+
+        if signature is None:
+            signature = minhash_signature(title_shingles(normalized))
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best_id, best_score = None, self.threshold
+        for record_id in candidates:
+            score = signature_similarity(signature, self._signatures[record_id])
+            if score >= best_score:
+                best_id, best_score = record_id, score
+        if best_id is not None:
+            return best_id
+
+        # A full title arriving after its truncated form was indexed. Only a truncated title
+        # stands for a longer one, a complete title that starts another is a different paper.
+        if len(normalized) >= PREFIX_LENGTH:
+            for record_id in self._prefixes.get(normalized[:PREFIX_LENGTH], ()):
+                if is_truncated(self.records[record_id].get('Title', '')) and normalized.startswith(self._titles[record_id]):
+                    return record_id
+        return None
+
+    def add(self, record):
+        # Adds a record, or merges it into the near-duplicate already indexed.
+        # Returns (record_id, is_duplicate).
+        title = record.get('Title', '')
+        normalized = _match_title(title)
+        truncated = is_truncated(title)
+        signature = minhash_signature(title_shingles(normalized))
+
+        record_id = self._find(normalized, truncated, signature) if normalized else None
+        if record_id is not None:
+            self._merge(record_id, record, normalized, truncated, signature)
+            return record_id, True
+
+        record_id = len(self.records)
+        self.records.append(dict(record))
+        self._titles.append(normalized)
+        self._signatures.append(signature)
+        self._register(record_id, normalized, signature)
+        return record_id, False
+
+    def _register(self, record_id, normalized, signature):
+        if not normalized:
+            # Without a title the record cannot match anything, it is kept but not indexed
+            return
+        self._exact.setdefault(normalized, record_id)
+        for key in _band_keys(signature):
+            self._buckets.setdefault(key, []).append(record_id)
+        if len(normalized) >= PREFIX_LENGTH:
+            self._prefixes.setdefault(normalized[:PREFIX_LENGTH], []).append(record_id)
+
+    def _merge(self, record_id, record, normalized, truncated, signature):
+        # Keeps the most complete version of each field
+        existing = self.records[record_id]
+        for field, value in record.items():
+            if value and not existing.get(field):
+                existing[field] = value
+        if not truncated and is_truncated(existing.get('Title', '')):
+            existing['Title'] = record['Title']
+            self._titles[record_id] = normalized
+            self._signatures[record_id] = signature
+            self._register(record_id, normalized, signature)
+
+def load_near_duplicate_index(csv_filenames, threshold=SIMILARITY_THRESHOLD):
+    # Builds an index from the rows of existing results CSV files
+    if isinstance(csv_filenames, str):
+        csv_filenames = [csv_filenames]
+    index = NearDuplicateIndex(threshold)
+    for csv_filename in csv_filenames:
+        if not os.path.exists(csv_filename):
+            continue
+        with open(csv_filename, mode='r', newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                index.add(row)
+    logging.info(f"Loaded {len(index)} unique records into the near-duplicate index")
+    return index
+
+def filter_near_duplicates(results_data, index):
+    # Returns only the results that are not near-duplicates of indexed records
+    new_data = []
+    for result in results_data:
+        _, is_duplicate = index.add(result)
+        if not is_duplicate:
+            new_data.append(result)
+    return new_data
@@ -0,0 +1,65 @@
+import logging
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+def normalize_link(link):
+    # Lowercases scheme and host and drops the fragment and trailing slash, so the same
+    # result served twice normalizes to the same string
+    parts = urlsplit((link or '').strip())
+    path = parts.path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+def page_fingerprint(results):
+    # Hash of the page's normalized result links, independent of their order.
+    # None for a page without results, which says nothing about pagination.
+    links = sorted(normalize_link(result.get('Link')) for result in results)
+    if not links:
+        return None
+    return hashlib.blake2b('\n'.join(links).encode('utf-8'), digest_size=16).hexdigest()
+
+class PaginationGuard:
+    # Stops pagination for one query once a page repeats the result set of another page,
+    # as search engines do past their last real page by serving it again
+
+    def __init__(self, query):
+        self.query = query
+        self.stop_page = None  # Last page worth fetching, set once a repeat is seen
+        self.requests_saved = 0
+        self._pages = {}
+
+    def is_repeat(self, page, results):
+        # Records the page's fingerprint, returns True when another page already had it
+        fingerprint = page_fingerprint(results)
+        if fingerprint is None:
+            return False
+        first_page = self._pages.setdefault(fingerprint, page)
+        if first_page == page:
+            return False
+        last_page = min(first_page, page)
+        if self.stop_page is None or last_page < self.stop_page:
+            self.stop_page = last_page
+        logging.warning(f"Page {max(first_page, page)} repeats the results of page {last_page}, stopping pagination after page {self.stop_page}")
+        return True
+
+    def beyond_stop(self, page):
+        return self.stop_page is not None and page > self.stop_page
+
+    def cancel_pending(self, futures):
+        # Cancels the queued page fetches past the stop page, futures maps each future to its page
+        for future, page in futures.items():
+            if self.beyond_stop(page) and not future.done() and future.cancel():
+                self.requests_saved += 1
+
+    def drop_pending(self, pages):
+        # Filters out pages past the stop page that have not been fetched yet
+        kept = [page for page in pages if not self.beyond_stop(page)]
+        self.requests_saved += len(pages) - len(kept)
+        return kept
+
+    def report(self):
+        # Logs how many page requests stopping early saved, and returns that number
+        if self.stop_page is not None:
+            message = f"Stopped pagination for query {self.query} after page {self.stop_page}, saved {self.requests_saved} page requests"
+            logging.info(message, extra={'event': 'pagination_stopped'})
+            print(message)
+        return self.requests_saved
@@ -0,0 +1,113 @@
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Result fields in CSV order, and the record attribute holding each
+FIELDS = ('Title', 'Link', 'MLA Citation', 'Snippet')
+_ATTRIBUTES = {'Title': 'title', 'Link': 'link', 'MLA Citation': 'mla_citation', 'Snippet': 'snippet'}
+# Values that repeat across records and pages: placeholders like "Title not found", and the
+# same publication found again by another page or year window. Snippets are rarely shared.
+_INTERNED_FIELDS = frozenset(['Title', 'Link', 'MLA Citation'])
+
+def _intern(field, value):
+    return sys.intern(value) if field in _INTERNED_FIELDS and type(value) is str else value
+
+class PublicationRecord(Mapping):
+    # One search result in a fixed set of slots instead of a per-record dict. It reads like
+    # the result dicts it replaces (record['Title'], record.get('Snippet', ''), dict(record)),
+    # and a field that was never set is missing rather than empty, as it would be in the dict.
+
+    __slots__ = ('title', 'link', 'mla_citation', 'snippet')
+
+    def __init__(self, title=None, link=None, mla_citation=None, snippet=None):
+        self.title = _intern('Title', title)
+        self.link = _intern('Link', link)
+        self.mla_citation = _intern('MLA Citation', mla_citation)
+        self.snippet = snippet
+
+    @classmethod
+    def from_dict(cls, result):
+        return cls(*(result.get(field) for field in FIELDS))
+
+    def __getitem__(self, field):
+        value = getattr(self, _ATTRIBUTES[field]) if field in _ATTRIBUTES else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        return (field for field in FIELDS if getattr(self, _ATTRIBUTES[field]) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+def to_records(results):
+    # Converts result dicts, from a parser or a loaded progress file, to records
+    return [result if isinstance(result, PublicationRecord) else PublicationRecord.from_dict(result) for result in results]
+
+def to_dicts(results):
+    # Plain dicts for json.dump
+    return [dict(result) for result in results]
+
+class RecordBatch:
+    # Columnar container for the results of one or more pages. Each field is one UTF-8 buffer
+    # with an array of end offsets, and a byte per record flags missing fields, so a record
+    # costs 17 bytes plus its text instead of a dict and a str object per field.
+    # Records are decoded on access; iterating yields PublicationRecords.
+
+    def __init__(self, results=()):
+        self._buffers = [bytearray() for _ in FIELDS]
+        self._ends = [array('I') for _ in FIELDS]
+        self._missing = array('B')
+        self.extend(results)
+
+    def append(self, result):
+        missing = 0
+        for bit, field in enumerate(FIELDS):
+            value = result.get(field)
+            buffer = self._buffers[bit]
+            if value is None:
+                missing |= 1 << bit
+            else:
+                buffer += str(value).encode('utf-8')
+            self._ends[bit].append(len(buffer))
+        self._missing.append(missing)
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __len__(self):
+        return len(self._missing)
+
+    def __bool__(self):
+        return len(self._missing) > 0
+
+    def _value(self, bit, index):
+        if self._missing[index] & (1 << bit):
+            return None
+        ends = self._ends[bit]
+        start = ends[index - 1] if index else 0
+        return self._buffers[bit][start:ends[index]].decode('utf-8')
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return PublicationRecord(*(self._value(bit, index) for bit in range(len(FIELDS))))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield PublicationRecord(*(self._value(bit, index) for bit in range(len(FIELDS))))
+
+    def column(self, field):
+        # All values of one field, None where it is missing
+        bit = FIELDS.index(field)
+        return [self._value(bit, index) for index in range(len(self))]
+
+    def __repr__(self):
+        return f"RecordBatch({list(self)!r})"
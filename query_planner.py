@@ -0,0 +1,109 @@
+import re
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bs4 import BeautifulSoup
+from incremental import publication_key
+
+# Google Scholar stops serving results after about 1000 hits
+SCHOLAR_RESULT_CAP = 1000
+# Scholar serves at most 20 results per page through the num parameter
+RESULTS_PER_PAGE = 20
+DEFAULT_FIRST_YEAR = 1990
+
+_RESULT_COUNT_RE = re.compile(r'(?:About\s+)?(\d[\d,.\s]*)\s+results?', re.IGNORECASE)
+_RESULT_COUNT_SELECTORS = ['#gs_ab_md', '#result-stats']
+
+def parse_result_count(html):
+    # Parses the "About N results" estimate from a Scholar or Google result page
+    soup = BeautifulSoup(html, 'html.parser')
+    for selector in _RESULT_COUNT_SELECTORS:
+        tag = soup.select_one(selector)
+        if tag:
+            match = _RESULT_COUNT_RE.search(tag.get_text(' ', strip=True))
+            if match:
+                return int(re.sub(r'\D', '', match.group(1)))
+    return None
+
+def year_window_params(year_from, year_to):
+    # Scholar's publication year filter, either bound can be left open
+    params = {}
+    if year_from is not None:
+        params['as_ylo'] = year_from
+    if year_to is not None:
+        params['as_yhi'] = year_to
+    return params
+
+def plan_year_windows(estimate_window, year_from=DEFAULT_FIRST_YEAR, year_to=None, cap=SCHOLAR_RESULT_CAP):
+    # Splits a query into disjoint publication-year windows that each stay under the result cap.
+    # estimate_window(params) fetches the first page of a window and returns (count, first_page_results);
+    # windows that still hit the cap are bisected until they fit or cover a single year.
+    year_to = year_to or datetime.now().year
+    pending = [(None, year_from - 1), (year_from, year_to)]
+    windows = []
+
+    while pending:
+        window_from, window_to = pending.pop()
+        params = year_window_params(window_from, window_to)
+        count, first_page_results = estimate_window(params)
+        logging.info(f"Year window {window_from}-{window_to}: estimated {count} results")
+
+        if count == 0 or (count is None and not first_page_results):
+            continue
+        if count is not None and count >= cap and window_from is not None and window_to > window_from:
+            middle = (window_from + window_to) // 2
+            pending.append((window_from, middle))
+            pending.append((middle + 1, window_to))
+            continue
+        if count is not None and count >= cap:
+            logging.warning(f"Year window {window_from}-{window_to} still exceeds the result cap, recall is limited to {cap} results")
+
+        windows.append({
+            'year_from': window_from,
+            'year_to': window_to,
+            'params': params,
+            'count': count,
+            'first_page_results': first_page_results
+        })
+
+    windows.sort(key=lambda window: window['year_from'] or 0)
+    return windows
+
+def window_page_count(window, cap=SCHOLAR_RESULT_CAP, results_per_page=RESULTS_PER_PAGE):
+    # Number of result pages to request for a window, including its first page
+    count = window['count'] if window['count'] is not None else cap
+    return max(1, -(-min(count, cap) // results_per_page))
+
+def merge_results(result_lists):
+    # Merges the results of disjoint windows, keeping the first occurrence of each publication
+    seen_keys = set()
+    merged = []
+    for results in result_lists:
+        for result in results:
+            key = publication_key(result)
+            if key is not None:
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+            merged.append(result)
+    return merged
+
+def crawl_windows(windows, crawl_window, workers=3, results_per_page=RESULTS_PER_PAGE):
+    # Crawls the remaining pages of each window in parallel. crawl_window(window, start_page, total_pages)
+    # returns the results of those pages; first pages were already fetched while planning.
+    result_lists = [window['first_page_results'] for window in windows]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for window in windows:
+            total_pages = window_page_count(window, results_per_page=results_per_page) - 1
+            if total_pages > 0:
+                futures[executor.submit(crawl_window, window, 1, total_pages)] = window
+        for future in as_completed(futures):
+            window = futures[future]
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                logging.error(f"Crawling year window {window['year_from']}-{window['year_to']} failed: {e}")
+    merged = merge_results(result_lists)
+    logging.info(f"Merged {sum(len(r) for r in result_lists)} results from {len(windows)} windows into {len(merged)} unique results")
+    return merged
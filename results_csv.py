@@ -0,0 +1,24 @@
+import os
+import csv
+
+def read_csv_header(csv_filename):
+    # Returns the columns of an existing CSV file so appended rows keep its layout
+    if not os.path.exists(csv_filename) or os.path.getsize(csv_filename) == 0:
+        return None
+    with open(csv_filename, mode='r', newline='', encoding='utf-8') as file:
+        return next(csv.reader(file), None)
+
+def append_rows(rows, csv_filename, default_fieldnames):
+    # Appends result rows in the column layout of the file's header. A new file gets
+    # default_fieldnames as its header; fields the file has no column for are left out,
+    # so rows added to a file written before a column existed still line up.
+    fieldnames = read_csv_header(csv_filename)
+
+    with open(csv_filename, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames or default_fieldnames)
+
+        if not fieldnames:
+            writer.writeheader()
+
+        for row in rows:
+            writer.writerow({field: row.get(field, '') for field in writer.fieldnames})
@@ -0,0 +1,177 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+# Error classes, in the order they are checked
+PROXY = 'proxy'
+TLS = 'tls'
+TIMEOUT = 'timeout'
+CONNECT = 'connect'
+THROTTLED = '429'
+SERVER = '5xx'
+CLIENT = '4xx'
+PARSE_EMPTY = 'parse_empty'
+BLOCKED = 'blocked'
+OTHER = 'other'
+
+# Errors caused by the route to the host rather than the host itself: retry through another proxy
+PROXY_ERRORS = frozenset([PROXY, TLS, TIMEOUT, CONNECT])
+# Errors where the host answered and refused: the same host must be given time
+HOST_ERRORS = frozenset([THROTTLED, SERVER])
+
+# error class: (retries allowed, base delay in seconds). Delays grow exponentially
+# from the base with full jitter, and a Retry-After header overrides them.
+RETRY_RULES = {
+    PROXY: (4, 1),
+    TLS: (2, 1),
+    TIMEOUT: (4, 2),
+    CONNECT: (4, 1),
+    THROTTLED: (3, 30),
+    SERVER: (3, 5),
+    CLIENT: (0, 0),
+    PARSE_EMPTY: (1, 5),
+    BLOCKED: (2, 60),
+    OTHER: (2, 5),
+}
+MAX_ATTEMPTS = 5
+MAX_DELAY = 120
+
+# Crawl-wide retry budget: every first attempt earns RETRY_BUDGET_RATIO of a retry, with
+# RETRY_BUDGET_RESERVE available from the start, so retries that reach the host stay within
+# about 20% of the request volume however many pages fail at once
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_RESERVE = 10
+RETRY_BUDGET_CAP = 50
+
+# Exception class names, checked along the MRO so requests, aiohttp and selenium errors
+# classify the same way without importing any of them here
+_EXCEPTION_CLASSES = [
+    ('ProxyError', PROXY),
+    ('ClientProxyConnectionError', PROXY),
+    ('ClientHttpProxyError', PROXY),
+    ('SSLError', TLS),
+    ('ClientSSLError', TLS),
+    ('ClientConnectorCertificateError', TLS),
+    ('Timeout', TIMEOUT),
+    ('ServerTimeoutError', TIMEOUT),
+    ('TimeoutError', TIMEOUT),
+    ('TimeoutException', TIMEOUT),
+    ('BlockedPageError', BLOCKED),
+    # Browser navigation failures through a proxy (refused, reset, unreachable) all surface as this
+    ('WebDriverException', CONNECT),
+]
+
+def response_of(exc):
+    return getattr(exc, 'response', None)
+
+def status_of(exc):
+    # HTTP status carried by a requests HTTPError or an aiohttp ClientResponseError
+    response = response_of(exc)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code
+    status = getattr(exc, 'status', None)
+    return status if isinstance(status, int) else None
+
+def classify_status(status):
+    if status == 429:
+        return THROTTLED
+    if status == 407 or status == 403:
+        # Proxy authentication, or the host refusing this exit address
+        return PROXY
+    if status >= 500:
+        return SERVER
+    if status >= 400:
+        return CLIENT
+    return OTHER
+
+def classify_error(exc):
+    # Maps a request exception to one of the error classes above
+    status = status_of(exc)
+    if status is not None:
+        return classify_status(status)
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    for name, error_class in _EXCEPTION_CLASSES:
+        if name in names:
+            return error_class
+    if names & {'ConnectionError', 'ClientConnectorError', 'ServerDisconnectedError', 'ClientOSError', 'ClientConnectionError'}:
+        return CONNECT
+    return OTHER
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def retry_after_of(exc):
+    response = response_of(exc)
+    headers = getattr(response, 'headers', None) if response is not None else getattr(exc, 'headers', None)
+    return parse_retry_after(headers.get('Retry-After')) if headers else None
+
+# Failures the host saw, whose retries load the host and are charged to the budget. Proxy,
+# TLS, timeout and connect failures with free proxies are the common case and never reach
+# the host, they are limited by their retry counts alone.
+BUDGETED_ERRORS = HOST_ERRORS | {BLOCKED, PARSE_EMPTY}
+
+class RetryBudget:
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, reserve=RETRY_BUDGET_RESERVE, cap=RETRY_BUDGET_CAP):
+        self.ratio = ratio
+        self.cap = cap
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+class RetryPolicy:
+    # Decides whether and when to retry a failed request. Shared by every worker of a crawl,
+    # so the retry budget is spent crawl-wide.
+
+    def __init__(self, rules=None, max_attempts=MAX_ATTEMPTS, max_delay=MAX_DELAY, budget=None, on_exhausted=None):
+        self.rules = dict(RETRY_RULES, **(rules or {}))
+        self.max_attempts = max_attempts
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.on_exhausted = on_exhausted
+
+    def record_request(self):
+        # Called once per new request (not per retry), it earns retry budget
+        self.budget.earn()
+
+    def backoff(self, error_class, retry_number, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        _, base = self.rules.get(error_class, self.rules[OTHER])
+        return random.uniform(base, min(self.max_delay, base * 2 ** retry_number))
+
+    def next_delay(self, error_class, retry_number, retry_after=None):
+        # Seconds to wait before retry number retry_number (1 for the first retry),
+        # or None when the request should not be retried
+        allowed, _ = self.rules.get(error_class, self.rules[OTHER])
+        if retry_number > allowed or retry_number >= self.max_attempts:
+            return None
+        if error_class in BUDGETED_ERRORS and not self.budget.spend():
+            logging.warning(f"Retry budget exhausted, not retrying a {error_class} failure")
+            if self.on_exhausted:
+                self.on_exhausted(error_class)
+            return None
+        return self.backoff(error_class, retry_number, retry_after)
+
+RETRY_POLICY = RetryPolicy()
@@ -1,9 +1,33 @@
 import requests
-import pandas as pd
 from bs4 import BeautifulSoup
 import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from retry_policy import HOST_ERRORS, classify_error, retry_after_of
+
+# Scholar requests are spaced REQUEST_DELAY seconds apart across the page loop and the citation
+# workers, so fetching citations in the background does not raise the crawler's request rate
+REQUEST_DELAY = 1
+CITATION_WORKERS = 2
+CITATION_RETRIES = 3
+
+_request_lock = threading.Lock()
+_last_request = 0.0
+
+# Citation lookups keyed by article URL, so an article seen on several pages is only fetched once
+citation_futures = {}
+
+def wait_for_request_slot():
+    global _last_request
+    with _request_lock:
+        wait = _last_request + REQUEST_DELAY - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.monotonic()
 
 def get_html_for_page(url):
+    wait_for_request_slot()
     response = requests.get(url)
     response.raise_for_status()
     return response.text
@@ -22,6 +46,33 @@ def get_citations(article_url):
         data.append(entry)
     return data
 
+def get_citations_with_retry(article_url):
+    # Retries 429 and 5xx responses with exponential backoff, returning an empty list if every
+    # attempt fails. Other failures such as a 404 will not succeed on a retry.
+    for attempt in range(1, CITATION_RETRIES + 1):
+        try:
+            return get_citations(article_url)
+        except requests.RequestException as e:
+            if classify_error(e) not in HOST_ERRORS or attempt == CITATION_RETRIES:
+                logging.error(f"Failed to fetch citations for {article_url}: {e}")
+                return []
+            time.sleep(retry_after_of(e) or 2 ** attempt)
+        except AttributeError as e:
+            # A citation table without the expected tags fails the same way every time
+            logging.error(f"Could not parse citations for {article_url}: {e}")
+            return []
+
+def fetch_citations_async(entries, executor):
+    # Queues citation fetches for a page's articles on the worker pool
+    for entry in entries:
+        if entry["url"] not in citation_futures:
+            citation_futures[entry["url"]] = executor.submit(get_citations_with_retry, entry["url"])
+
+def collect_citations(entries):
+    # Waits for the queued citation fetches and attaches them to their articles
+    for entry in entries:
+        entry["citations"] = citation_futures[entry["url"]].result()
+
 def parse_data_from_article(article):
     title_elem = article.find("h3", {"class": "gs_rt"})
     title = title_elem.get_text()
@@ -32,7 +83,6 @@ def parse_data_from_article(article):
         "title": title,
         "authors": authors,
         "url": url,
-        "citations": get_citations(url),
     }
 
 def get_url_for_page(url, page_index):
@@ -44,20 +94,30 @@ def get_data_from_page(url):
     articles = soup.find_all("div", {"class": "gs_ri"})
     return [parse_data_from_article(article) for article in articles]
 
-data = []
-url = "https://scholar.google.com/scholar?q=global+warming&hl=en&as_sdt=0,5"
+def main():
+    # pandas is only needed for the final CSV, so it is imported here rather than at module import
+    import pandas as pd
+
+    data = []
+    url = "https://scholar.google.com/scholar?q=global+warming&hl=en&as_sdt=0,5"
+
+    NUM_OF_PAGES = 2
+    page_index = 0
+    # Citations are fetched on the worker pool while the next result page is loaded
+    with ThreadPoolExecutor(max_workers=CITATION_WORKERS) as executor:
+        for _ in range(NUM_OF_PAGES):
+            page_url = get_url_for_page(url, page_index)
+            entries = get_data_from_page(page_url)
+            fetch_citations_async(entries, executor)
+            data.extend(entries)
+            page_index += 10
+        collect_citations(data)
 
-NUM_OF_PAGES = 2
-page_index = 0
-for _ in range(NUM_OF_PAGES):
-    page_url = get_url_for_page(url, page_index)
-    entries = get_data_from_page(page_url)
-    data.extend(entries)
-    page_index += 10
-    time.sleep(1)  # Add delay to prevent getting blocked
+    # Convert the data to a DataFrame and save to a CSV file
+    df = pd.DataFrame(data)
+    df.to_csv("scholar_results.csv", index=False)
 
-# Convert the data to a DataFrame and save to a CSV file
-df = pd.DataFrame(data)
-df.to_csv("scholar_results.csv", index=False)
+    print("Data has been saved to scholar_results.csv")
 
-print("Data has been saved to scholar_results.csv")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import logging
+from ack_verifier import ACKNOWLEDGMENT_VARIANTS, normalize_text, get_matcher
+
+# Hits scoring at or above ACCEPT_SCORE are taken as confirmed from their
+# snippet alone, hits below REJECT_SCORE are dropped, and everything in
+# between is left for the full-text verifier.
+ACCEPT_SCORE = 0.8
+REJECT_SCORE = 0.35
+
+STOPWORDS = frozenset(['the', 'a', 'an', 'and', 'of', 'in', 'at', 'through', 'this', 'was', 'were', 'by', 'for', 'to', 'part', 'work'])
+
+def _phrase_features(text):
+    words = normalize_text(text).split()
+    tokens = frozenset(w for w in words if w not in STOPWORDS)
+    bigrams = frozenset(zip(words, words[1:]))
+    return tokens, bigrams
+
+# Token and bigram sets of the full acknowledgment sentence, computed once
+_PHRASE_TOKENS, _PHRASE_BIGRAMS = _phrase_features(ACKNOWLEDGMENT_VARIANTS[0])
+
+def score_snippet(snippet):
+    # Scores 1.0 when a snippet contains any known wording verbatim, otherwise the
+    # token-set similarity to the full sentence, weighting word order through shared bigrams
+    if not snippet:
+        return 0.0
+    if get_matcher().first_match(normalize_text(snippet)):
+        return 1.0
+    tokens, bigrams = _phrase_features(snippet)
+    token_score = len(_PHRASE_TOKENS & tokens) / len(_PHRASE_TOKENS)
+    bigram_score = len(_PHRASE_BIGRAMS & bigrams) / len(_PHRASE_BIGRAMS)
+    return 0.6 * token_score + 0.4 * bigram_score
+
+def classify_score(score):
+    if score >= ACCEPT_SCORE:
+        return 'accept'
+    if score < REJECT_SCORE:
+        return 'reject'
+    return 'verify'
+
+def triage_hits(results_data):
+    # Splits hits into (accepted, to_verify, rejected) by snippet score.
+    # Hits without a snippet are always sent to full-text verification.
+    accepted, to_verify, rejected = [], [], []
+    for result in results_data:
+        snippet = result.get('Snippet')
+        if not snippet:
+            to_verify.append(result)
+            continue
+        score = score_snippet(snippet)
+        result['Snippet Score'] = round(score, 3)
+        decision = classify_score(score)
+        if decision == 'accept':
+            accepted.append(result)
+        elif decision == 'reject':
+            rejected.append(result)
+        else:
+            to_verify.append(result)
+    logging.info(f"Snippet triage: {len(accepted)} accepted, {len(to_verify)} to verify, {len(rejected)} rejected")
+    return accepted, to_verify, rejected
@@ -1,27 +1,32 @@
 import os
+import sys
 import requests
 from bs4 import BeautifulSoup
-import csv
 import time
 import random
 import logging
 import json
-from fake_useragent import UserAgent
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
+from pubmed_eutils import EUTILS_BASE_URL, fetch_pubmed_results
 
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from results_csv import append_rows
 
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def setup_logging():
+    # Setup logging to file with date-based filename, called from main() so importing creates no files
+    log_filename = f"{datetime.now().strftime('%Y-%m-%d')}.log"
+    logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Generate a random user agent
-user_agent_cache = UserAgent()
+# Random user agent generator, created on first use since it loads its dataset when constructed
+user_agent_cache = None
 def get_random_user_agent():
+    global user_agent_cache
+    if user_agent_cache is None:
+        from fake_useragent import UserAgent
+        user_agent_cache = UserAgent()
     return user_agent_cache.random
 
 def scrape_proxies():
@@ -109,10 +114,23 @@ def fetch_search_results(config, query, total_pages=10, start_page=0, valid_prox
 
     return results_data
 
+def build_page_params(config, query, page):
+    # Builds the query string for a page using the engine's pagination settings,
+    # requesting the largest page size the engine supports
+    pagination = config.get('pagination', DEFAULT_PAGINATION)
+    page_size = pagination.get('max_page_size')
+    params = {config['query_param']: query}
+    if pagination['style'] == 'offset':
+        params[pagination['param']] = page * (page_size or pagination.get('default_page_size', 10))
+    else:
+        params[pagination['param']] = page + pagination.get('first_page', 0)
+    if pagination.get('size_param') and page_size:
+        params[pagination['size_param']] = page_size
+    return params
+
 def fetch_page_results(config, query, page, valid_proxies):
     # Fetches search results from a single page of the specified website
-    start = page * 10
-    params = {config['query_param']: query, 'page': page}
+    params = build_page_params(config, query, page)
     headers = {'User-Agent': get_random_user_agent()}
     
     success = False
@@ -156,8 +174,10 @@ def parse_results(html, parsing_rules):
         link = result.select_one(parsing_rules['link_selector'])['href'] if result.select_one(parsing_rules['link_selector']) else "Link not found"
         if parsing_rules.get('link_prefix'):
             link = parsing_rules['link_prefix'] + link
+        snippet_tag = result.select_one(parsing_rules['snippet_selector']) if parsing_rules.get('snippet_selector') else None
+        snippet = snippet_tag.get_text(' ', strip=True) if snippet_tag else ""
         
-        results_data.append({'Title': title, 'Link': link})
+        results_data.append({'Title': title, 'Link': link, 'Snippet': snippet})
     
     return results_data
 
@@ -165,17 +185,8 @@ def write_to_csv(results_data):
     # Writes search results to a CSV file
     csv_date = datetime.now().strftime("%Y-%m-%d")
     csv_filename = f"{csv_date}_results.csv"
-    file_exists = os.path.isfile(csv_filename)
-    
-    with open(csv_filename, mode='a', newline='', encoding='utf-8') as file:
-        fieldnames = ['Title', 'Link']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        
-        if not file_exists:
-            writer.writeheader()
-        
-        for result in results_data:
-            writer.writerow({field: result[field] for field in fieldnames})
+    # Files written before snippets were kept have no Snippet column, rows appended to them keep the old layout
+    append_rows(results_data, csv_filename, ['Title', 'Link', 'Snippet'])
 
 def save_progress(config, query, total_pages, current_page, results_data):
     # Saves the current progress to a JSON file
@@ -219,10 +230,31 @@ def get_page_input():
         else:
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
+# Pagination settings of an engine config:
+#   style            'offset' (param is the index of the first result) or 'page' (param is the page number)
+#   param            query parameter carrying the offset or page number
+#   first_page       number of the first page for 'page' style engines
+#   size_param       query parameter setting the page size, if the engine has one
+#   max_page_size    largest page size the engine serves
+#   default_page_size  page size when the engine has no size parameter
+DEFAULT_PAGINATION = {
+    'style': 'page',
+    'param': 'page',
+    'first_page': 0,
+    'size_param': None,
+    'max_page_size': None
+}
+
 def load_config(search_engine, custom_config=None):
     # Load the configuration for the specified search engine or use a custom configuration
     configs = {
         'pubmed': {
+            # Bulk harvesting through the E-utilities history server instead of page scraping
+            'api': 'eutils',
+            'base_url': EUTILS_BASE_URL,
+            'query_param': 'term'
+        },
+        'pubmed_html': {
             'base_url': 'https://pubmed.ncbi.nlm.nih.gov',
             'validation_url': 'https://pubmed.ncbi.nlm.nih.gov',
             'query_param': 'term',
@@ -230,7 +262,15 @@ def load_config(search_engine, custom_config=None):
                 'result_selector': 'article.full-docsum',
                 'title_selector': 'a.docsum-title',
                 'link_selector': 'a.docsum-title',
+                'snippet_selector': 'div.full-view-snippet',
                 'link_prefix': 'https://pubmed.ncbi.nlm.nih.gov'
+            },
+            'pagination': {
+                'style': 'page',
+                'param': 'page',
+                'first_page': 1,
+                'size_param': 'size',
+                'max_page_size': 200
             }
         },
         'scholar': {
@@ -241,7 +281,15 @@ def load_config(search_engine, custom_config=None):
                 'result_selector': 'div.gs_r.gs_or.gs_scl',
                 'title_selector': 'h3.gs_rt',
                 'link_selector': 'h3.gs_rt > a',
+                'snippet_selector': 'div.gs_rs',
                 'link_prefix': None
+            },
+            'pagination': {
+                'style': 'offset',
+                'param': 'start',
+                'size_param': 'num',
+                'max_page_size': 20,
+                'default_page_size': 10
             }
         },
         # Add more search engines as needed
@@ -272,8 +320,33 @@ def get_custom_config():
         }
     }
 
+def get_max_records_input():
+    # Gets the maximum number of records to harvest, blank for all of them
+    while True:
+        max_records = input("Enter the maximum number of records to fetch (leave blank for all): ").strip()
+        if not max_records:
+            return None
+        if max_records.isdigit():
+            return int(max_records)
+        print("Invalid input. Please enter an integer value or leave blank.")
+
+def run_eutils_search(query):
+    # Harvests PubMed records in bulk through E-utilities and writes them to CSV
+    max_records = get_max_records_input()
+    logging.info(f"Starting PubMed E-utilities harvest for query: {query}")
+    results_data = fetch_pubmed_results(query, max_records=max_records)
+
+    if results_data:
+        logging.info(f"Fetched {len(results_data)} results.")
+    else:
+        logging.warning("No results fetched.")
+
+    write_to_csv(results_data)
+    logging.info("Results written to CSV")
+
 def main():
-    search_engine = input("Enter the search engine (pubmed, scholar, custom): ").strip().lower()
+    setup_logging()
+    search_engine = input("Enter the search engine (pubmed, pubmed_html, scholar, custom): ").strip().lower()
     
     if search_engine == 'custom':
         config = get_custom_config()
@@ -285,6 +358,10 @@ def main():
         return
 
     query = input("Enter the search query: ").strip()
+
+    if config.get('api') == 'eutils':
+        run_eutils_search(query)
+        return
     
     progress = load_progress()
     if progress and progress['query'] == query and progress['config']['base_url'] == config['base_url']:
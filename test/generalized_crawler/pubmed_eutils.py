@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from tqdm import tqdm
+
+EUTILS_BASE_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils'
+NCBI_API_KEY = os.environ.get('NCBI_API_KEY')
+NCBI_TOOL = 'publication_crawler'
+NCBI_EMAIL = os.environ.get('NCBI_EMAIL')
+
+FETCH_CHUNK_SIZE = 500  # PubMed records per efetch call
+FETCH_WORKERS = 3
+
+# NCBI allows 3 requests per second without an API key and 10 with one
+MIN_REQUEST_INTERVAL = 0.1 if NCBI_API_KEY else 0.34
+
+_rate_lock = threading.Lock()
+_next_request_time = 0.0
+
+def wait_for_rate_limit():
+    # Spaces E-utilities calls out across all fetch threads
+    global _next_request_time
+    with _rate_lock:
+        now = time.monotonic()
+        if now < _next_request_time:
+            time.sleep(_next_request_time - now)
+            now = _next_request_time
+        _next_request_time = now + MIN_REQUEST_INTERVAL
+
+def eutils_params(**params):
+    params['tool'] = NCBI_TOOL
+    if NCBI_EMAIL:
+        params['email'] = NCBI_EMAIL
+    if NCBI_API_KEY:
+        params['api_key'] = NCBI_API_KEY
+    return params
+
+def eutils_stream(endpoint, params, retries=3):
+    # POSTs to an E-utilities endpoint and returns the streamed response
+    url = f"{EUTILS_BASE_URL}/{endpoint}"
+    for attempt in range(1, retries + 1):
+        wait_for_rate_limit()
+        try:
+            response = requests.post(url, data=params, stream=True, timeout=60)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return response
+        except requests.RequestException as e:
+            logging.error(f"E-utilities {endpoint} request failed (retries left: {retries - attempt}): {e}")
+            if attempt < retries:
+                time.sleep(2 ** attempt)
+    return None
+
+def esearch(query):
+    # Runs the search on the history server and returns (count, webenv, query_key)
+    response = eutils_stream('esearch.fcgi', eutils_params(db='pubmed', term=query, usehistory='y', retmax=0))
+    if response is None:
+        return 0, None, None
+    count, webenv, query_key = None, None, None
+    with response:
+        for _, elem in ET.iterparse(response.raw, events=('end',)):
+            # Only the top-level Count is wanted, not the per-term counts in TranslationStack
+            if elem.tag == 'Count' and count is None:
+                count = int(elem.text or 0)
+            elif elem.tag == 'WebEnv':
+                webenv = elem.text
+            elif elem.tag == 'QueryKey':
+                query_key = elem.text
+            elif elem.tag == 'TranslationStack':
+                elem.clear()
+    count = count or 0
+    logging.info(f"PubMed esearch found {count} records for query: {query}")
+    return count, webenv, query_key
+
+def parse_pubmed_article(elem):
+    # Extracts the fields kept for each PubmedArticle element
+    pmid = elem.findtext('MedlineCitation/PMID', default='')
+    article = elem.find('MedlineCitation/Article')
+    title = ''.join(article.find('ArticleTitle').itertext()).strip() if article is not None and article.find('ArticleTitle') is not None else "Title not found"
+    journal = article.findtext('Journal/Title', default='') if article is not None else ''
+    year = article.findtext('Journal/JournalIssue/PubDate/Year', default='') if article is not None else ''
+    doi = ''
+    for article_id in elem.iterfind('PubmedData/ArticleIdList/ArticleId'):
+        if article_id.get('IdType') == 'doi':
+            doi = article_id.text or ''
+    return {
+        'Title': title,
+        'Link': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else "Link not found",
+        'PMID': pmid,
+        'Journal': journal,
+        'Year': year,
+        'DOI': doi
+    }
+
+def efetch_chunk(webenv, query_key, retstart, retmax):
+    # Fetches one chunk of records from the history server, parsing the XML as it streams in
+    params = eutils_params(db='pubmed', WebEnv=webenv, query_key=query_key, retstart=retstart, retmax=retmax, retmode='xml')
+    response = eutils_stream('efetch.fcgi', params)
+    if response is None:
+        return []
+    results_data = []
+    with response:
+        context = ET.iterparse(response.raw, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event == 'end' and elem.tag == 'PubmedArticle':
+                results_data.append(parse_pubmed_article(elem))
+                # Drop parsed articles so memory stays flat for large chunks
+                root.clear()
+    return results_data
+
+def fetch_pubmed_results(query, max_records=None, start=0):
+    # Harvests PubMed records for a query through esearch + batched efetch
+    count, webenv, query_key = esearch(query)
+    if not webenv:
+        logging.error("PubMed esearch did not return a history server session.")
+        return []
+
+    end = count if max_records is None else min(count, start + max_records)
+    results_data = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = [executor.submit(efetch_chunk, webenv, query_key, retstart, min(FETCH_CHUNK_SIZE, end - retstart))
+                   for retstart in range(start, end, FETCH_CHUNK_SIZE)]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching PubMed records", leave=True):
+            try:
+                results_data.extend(future.result())
+            except ET.ParseError as e:
+                logging.error(f"Failed to parse PubMed efetch response: {e}")
+            except Exception as e:
+                logging.error(f"Fetching PubMed records failed: {e}")
+    return results_data
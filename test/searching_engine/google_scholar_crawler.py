@@ -6,22 +6,22 @@ import time
 import random
 import logging
 import json
-from fake_useragent import UserAgent
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from datetime import datetime
 
-# Setup logging to file with date-based filename
-log_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"{log_date}.log"
-if not os.path.exists(log_filename):
-    open(log_filename, 'w').close()  # Create the file if it does not exist
+def setup_logging():
+    # Setup logging to file with date-based filename, called from main() so importing creates no files
+    log_filename = f"{datetime.now().strftime('%Y-%m-%d')}.log"
+    logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Generate a random user agent
-user_agent_cache = UserAgent()
+# Random user agent generator, created on first use since it loads its dataset when constructed
+user_agent_cache = None
 def get_random_user_agent():
+    global user_agent_cache
+    if user_agent_cache is None:
+        from fake_useragent import UserAgent
+        user_agent_cache = UserAgent()
     return user_agent_cache.random
 
 def scrape_proxies():
@@ -217,6 +217,7 @@ def get_page_input():
             print("Invalid input. Please enter integer values for starting page and total pages.")
 
 def main():
+    setup_logging()
     # Main function to manage fetching search results
     query = "This work was supported in part through the NYU IT High Performance Computing resources, services, and staff expertise"
     base_url = "https://scholar.google.com/scholar"
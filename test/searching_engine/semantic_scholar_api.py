@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import logging
+import argparse
+import threading
+import requests
+from tqdm import tqdm
+from semantic_scholar import setup_logging, write_to_csv
+
+# Semantic Scholar Graph API. Set SEMANTIC_SCHOLAR_API_URL to point the adapter
+# at a local mock of the API, and SEMANTIC_SCHOLAR_API_KEY to use a key.
+API_BASE_URL = os.environ.get('SEMANTIC_SCHOLAR_API_URL', 'https://api.semanticscholar.org/graph/v1')
+API_KEY = os.environ.get('SEMANTIC_SCHOLAR_API_KEY')
+
+DEFAULT_FIELDS = ['paperId', 'title', 'url', 'year', 'authors', 'venue', 'externalIds']
+BATCH_SIZE = 500  # Maximum number of ids accepted by /paper/batch
+
+# Requests per second allowed for keyed clients; unauthenticated clients share
+# a global pool, so they are paced much more conservatively.
+KEYED_MIN_INTERVAL = 1.0
+ANONYMOUS_MIN_INTERVAL = 3.0
+
+class RateLimiter:
+    # Spaces calls at least min_interval seconds apart across threads
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_call:
+                time.sleep(self._next_call - now)
+                now = self._next_call
+            self._next_call = now + self.min_interval
+
+rate_limiter = RateLimiter(KEYED_MIN_INTERVAL if API_KEY else ANONYMOUS_MIN_INTERVAL)
+
+def get_api_headers():
+    headers = {'Accept': 'application/json'}
+    if API_KEY:
+        headers['x-api-key'] = API_KEY
+    return headers
+
+def api_request(method, path, params=None, json_body=None, retries=5):
+    # Sends a rate-limited request to the Graph API and returns the decoded JSON
+    url = f"{API_BASE_URL}{path}"
+    for attempt in range(1, retries + 1):
+        rate_limiter.wait()
+        try:
+            response = requests.request(method, url, params=params, json=json_body, headers=get_api_headers(), timeout=30)
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == retries:
+                    logging.error(f"Semantic Scholar API returned {response.status_code}, giving up after {retries} attempts")
+                    break
+                retry_after = response.headers.get('Retry-After')
+                wait_time = float(retry_after) if retry_after and retry_after.isdigit() else min(60, 2 ** attempt) + random.uniform(0, 1)
+                logging.warning(f"Semantic Scholar API returned {response.status_code}, waiting {wait_time:.1f} seconds (attempt {attempt}/{retries})")
+                time.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            logging.error(f"Semantic Scholar API request failed (retries left: {retries - attempt}): {e}")
+            if attempt < retries:
+                time.sleep(min(60, 2 ** attempt))
+    return None
+
+def search_papers(query, fields=None, max_results=None, year=None):
+    # Yields papers matching the query using the bulk search endpoint, which
+    # pages with a continuation token and returns up to 1000 papers per call
+    params = {'query': query, 'fields': ','.join(fields or DEFAULT_FIELDS)}
+    if year:
+        params['year'] = year
+
+    fetched = 0
+    token = None
+    with tqdm(desc="Fetching Semantic Scholar results", leave=True) as progress_bar:
+        while True:
+            if token:
+                params['token'] = token
+            page = api_request('GET', '/paper/search/bulk', params=params)
+            if not page:
+                break
+            if progress_bar.total is None and page.get('total') is not None:
+                progress_bar.total = page['total'] if max_results is None else min(page['total'], max_results)
+                progress_bar.refresh()
+            for paper in page.get('data') or []:
+                yield paper
+                fetched += 1
+                progress_bar.update(1)
+                if max_results is not None and fetched >= max_results:
+                    return
+            token = page.get('token')
+            if not token:
+                break
+
+def fetch_papers_batch(paper_ids, fields=None):
+    # Looks up papers by id (S2 id, DOI:, ARXIV:, PMID: ...) in batches of BATCH_SIZE
+    params = {'fields': ','.join(fields or DEFAULT_FIELDS)}
+    papers = []
+    for start in range(0, len(paper_ids), BATCH_SIZE):
+        chunk = paper_ids[start:start + BATCH_SIZE]
+        batch = api_request('POST', '/paper/batch', params=params, json_body={'ids': chunk})
+        if batch is None:
+            logging.error(f"Batch lookup failed for ids {start} to {start + len(chunk) - 1}")
+            continue
+        # Unknown ids come back as null entries in the same position
+        papers.extend(paper for paper in batch if paper)
+    return papers
+
+def paper_to_result(paper):
+    # Converts a Graph API paper to the Title/Link records used by the CSV writers
+    link = paper.get('url') or (f"https://www.semanticscholar.org/paper/{paper['paperId']}" if paper.get('paperId') else "Link not found")
+    return {'Title': (paper.get('title') or "Title not found").strip(), 'Link': link}
+
+def read_paper_ids(filename):
+    # One paper id per line (S2 id, DOI:..., ARXIV:...), blank lines ignored
+    with open(filename, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch Semantic Scholar results through the Graph API")
+    parser.add_argument('--query', default="machine learning", help="Search query")
+    parser.add_argument('--ids', help="File of paper ids to look up through the batch endpoint instead of searching")
+    return parser.parse_args()
+
+def main():
+    # Main function to fetch search results through the Graph API
+    setup_logging()
+    args = parse_args()
+
+    if args.ids:
+        papers = fetch_papers_batch(read_paper_ids(args.ids))
+    else:
+        papers = search_papers(args.query)
+    results_data = [paper_to_result(paper) for paper in papers]
+
+    if results_data:
+        logging.info(f"Fetched {len(results_data)} results.")
+    else:
+        logging.warning("No results fetched.")
+
+    write_to_csv(results_data)
+    logging.info("Results written to CSV")
+
+if __name__ == "__main__":
+    main()
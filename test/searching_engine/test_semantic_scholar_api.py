@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import semantic_scholar_api as api
+
+# Two pages of search results joined by a continuation token, and a paper table for the batch endpoint
+SEARCH_PAGES = {
+    None: {'total': 3, 'token': 'page2', 'data': [{'paperId': 'p1', 'title': 'First'}, {'paperId': 'p2', 'title': ' Second '}]},
+    'page2': {'total': 3, 'data': [{'paperId': 'p3', 'title': 'Third', 'url': 'https://example.org/p3'}]},
+}
+PAPERS = {f'p{i}': {'paperId': f'p{i}', 'title': f'Paper {i}'} for i in range(1, 8)}
+
+class MockGraphAPI(BaseHTTPRequestHandler):
+    # Local stand-in for the Graph API. throttle_first answers the first N requests with a 429,
+    # every request is recorded on the server for the assertions.
+
+    def _reply(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttled(self):
+        self.server.requests.append((self.command, self.path))
+        if self.server.throttle_first > 0:
+            self.server.throttle_first -= 1
+            self._reply(429, {'message': 'Too Many Requests'}, {'Retry-After': '0'})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._throttled():
+            return
+        url = urlsplit(self.path)
+        token = parse_qs(url.query).get('token', [None])[0]
+        if url.path != '/paper/search/bulk' or token not in SEARCH_PAGES:
+            self._reply(404, {'error': 'not found'})
+            return
+        self._reply(200, SEARCH_PAGES[token])
+
+    def do_POST(self):
+        if self._throttled():
+            return
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.batch_sizes.append(len(body['ids']))
+        self._reply(200, [PAPERS.get(paper_id) for paper_id in body['ids']])
+
+    def log_message(self, format, *args):
+        pass
+
+class SemanticScholarApiTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), MockGraphAPI)
+        self.server.requests = []
+        self.server.batch_sizes = []
+        self.server.throttle_first = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        patches = [
+            mock.patch.object(api, 'API_BASE_URL', f'http://127.0.0.1:{self.server.server_port}'),
+            mock.patch.object(api, 'rate_limiter', api.RateLimiter(0)),
+            mock.patch.object(api.time, 'sleep'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.sleep = api.time.sleep
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_search_follows_continuation_token(self):
+        papers = list(api.search_papers('hpc'))
+        self.assertEqual([paper['paperId'] for paper in papers], ['p1', 'p2', 'p3'])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIn('token=page2', self.server.requests[1][1])
+
+    def test_search_stops_at_max_results(self):
+        papers = list(api.search_papers('hpc', max_results=2))
+        self.assertEqual(len(papers), 2)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_429_is_retried_after_retry_after(self):
+        self.server.throttle_first = 2
+        papers = list(api.search_papers('hpc'))
+        self.assertEqual(len(papers), 3)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual([call.args[0] for call in self.sleep.call_args_list], [0.0, 0.0])
+
+    def test_gives_up_without_sleeping_after_last_attempt(self):
+        self.server.throttle_first = 10
+        self.assertIsNone(api.api_request('GET', '/paper/search/bulk', params={'query': 'hpc'}, retries=3))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_batch_lookup_splits_ids_and_drops_unknown(self):
+        ids = [f'p{i}' for i in range(1, 8)] + ['missing']
+        with mock.patch.object(api, 'BATCH_SIZE', 3):
+            papers = api.fetch_papers_batch(ids)
+        self.assertEqual(self.server.batch_sizes, [3, 3, 2])
+        self.assertEqual([paper['paperId'] for paper in papers], [f'p{i}' for i in range(1, 8)])
+
+    def test_paper_to_result(self):
+        self.assertEqual(api.paper_to_result(SEARCH_PAGES[None]['data'][1]),
+                         {'Title': 'Second', 'Link': 'https://www.semanticscholar.org/paper/p2'})
+        self.assertEqual(api.paper_to_result(SEARCH_PAGES['page2']['data'][0])['Link'], 'https://example.org/p3')
+
+if __name__ == '__main__':
+    unittest.main()